@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from bench.run import main  # noqa: E402
+
+if __name__ == '__main__':
+    main()
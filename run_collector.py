@@ -0,0 +1,15 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+os.environ.setdefault('COLLECTOR_DATA_DIR', str(ROOT / 'data' / 'collector'))
+
+from perfmeter.collector import main  # noqa: E402
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from perfmeter.gemini_client import GeminiClient, estimate_tokens
+from perfmeter.llm_response import SCORE_SCHEMA, validate
+
+# Local stand-in for the generateContent / streamGenerateContent endpoints, with a fixed per-call latency.
+# It answers score prompts with a deterministic valid score: one object for a single-window prompt
+# ("Metrics: {...}"), an id-keyed object for a batch prompt ("Items: [...]"). Used to compare serial
+# score_metrics against score_metrics_batch without network or API key; exits 1 when any batched window
+# is missing or invalid, or a batch prompt exceeded the token budget.
+_ITEMS = re.compile(r'Items: (\[.*\])\n', re.S)
+_METRICS = re.compile(r'Metrics: (\{.*\})\n', re.S)
+
+
+def fake_score(data: Any) -> Dict[str, Any]:
+    score = len(json.dumps(data, sort_keys=True)) % 101
+    return {'score': score, 'grade': 'ABCDEF'[min(5, (100 - score) // 17)], 'notes': 'ok', 'rationale': 'stand-in'}
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.latency = latency
+        self.calls = 0
+        self.max_prompt_tokens = 0
+        self._lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+        prompt = body['contents'][0]['parts'][0]['text']
+        with self.server._lock:
+            self.server.calls += 1
+            self.server.max_prompt_tokens = max(self.server.max_prompt_tokens, estimate_tokens(prompt))
+        time.sleep(self.server.latency)
+        m = _ITEMS.search(prompt)
+        if m:
+            reply = {it['id']: fake_score(it['data']) for it in json.loads(m.group(1))}
+        else:
+            m = _METRICS.search(prompt)
+            reply = fake_score(json.loads(m.group(1)) if m else prompt)
+        text = json.dumps(reply)
+        if 'streamGenerateContent' in self.path:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for i in range(0, len(text), 64):
+                event = {'candidates': [{'content': {'parts': [{'text': text[i:i + 64]}]}}]}
+                self.wfile.write(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+            return
+        out = json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+def windows(n: int) -> Dict[str, Dict[str, Any]]:
+    return {f'w{i}': {'total_time_sec': 3600.0 + i, 'time_in_focus_sec': 2400.0, 'typing_words': 900 + i, 'wpm': 41.2,
+                      'app_switches': 120, 'time_by_app_sec': {'code.exe': 1800.0, 'chrome.exe': 1200.0}}
+            for i in range(n)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serial vs batched Gemini scoring against a local stand-in server')
+    parser.add_argument('--windows', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per stand-in call')
+    parser.add_argument('--token-budget', type=int, default=6000)
+    parser.add_argument('--max-items', type=int, default=25)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    server = StandIn(args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update(GEMINI_API_KEY='stand-in', GEMINI_ENDPOINT=f'http://127.0.0.1:{server.server_port}/models')
+    client = GeminiClient()
+    data = windows(args.windows)
+
+    t0 = time.perf_counter()
+    serial_ok = sum(1 for s in data.values() if client.score_metrics('engineer', s).get('ok'))
+    serial_sec = time.perf_counter() - t0
+    serial_calls = server.calls
+
+    server.calls = server.max_prompt_tokens = 0
+    res = client.score_metrics_batch('engineer', data, token_budget=args.token_budget, max_items=args.max_items,
+                                     concurrency=args.concurrency)
+    stats = res['stats']
+    bad = [i for i in data if not res['results'].get(i, {}).get('ok') or validate(res['results'][i]['data'], SCORE_SCHEMA)[1]]
+    report = {
+        'windows': args.windows, 'latency_sec': args.latency,
+        'serial': {'ok': serial_ok, 'calls': serial_calls, 'items_per_sec': round(args.windows / serial_sec, 1)},
+        'batched': {'ok': stats['ok'], 'calls': server.calls, 'batches': stats['batches'],
+                    'items_per_sec': round(stats['items_per_sec'], 1), 'tokens_per_item': round(stats['tokens_per_item'], 1),
+                    'max_prompt_tokens': server.max_prompt_tokens, 'token_budget': args.token_budget},
+        'failed': bad,
+    }
+    server.shutdown()
+    over = server.max_prompt_tokens > args.token_budget
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        s, b = report['serial'], report['batched']
+        print(f"serial   {s['items_per_sec']:8.1f} items/s  {s['calls']} calls  ok {s['ok']}/{args.windows}")
+        print(f"batched  {b['items_per_sec']:8.1f} items/s  {b['calls']} calls  ok {b['ok']}/{args.windows}  "
+              f"{b['tokens_per_item']} tokens/item  largest prompt {b['max_prompt_tokens']}/{b['token_budget']} tokens")
+        if bad:
+            print(f"missing or invalid: {', '.join(bad[:10])}")
+    sys.exit(1 if bad or over or serial_ok != args.windows else 0)
+
+
+if __name__ == '__main__':
+    main()
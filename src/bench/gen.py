@@ -0,0 +1,122 @@
+import json
+import math
+import random
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from perfmeter.aggregator import TitleDictionary
+from perfmeter.rules import default_classifier
+
+# exe -> (weight, title stems); weights follow a typical office day, explorer/flicker included on purpose
+APP_MIX: Dict[str, Tuple[float, List[str]]] = {
+    'code.exe': (0.22, ['main.py - project - Visual Studio Code', 'README.md - project - Visual Studio Code']),
+    'chrome.exe': (0.25, ['Inbox - Gmail - Google Chrome', 'Pull request · org/repo · GitHub - Google Chrome',
+                          'docs.google.com - Google Chrome', 'YouTube - Google Chrome']),
+    'outlook.exe': (0.10, ['Inbox - me@corp.com - Outlook', 'Calendar - Outlook']),
+    'teams.exe': (0.10, ['Standup | Microsoft Teams', 'Chat | Microsoft Teams']),
+    'slack.exe': (0.08, ['#general | corp - Slack']),
+    'excel.exe': (0.06, ['budget.xlsx - Excel']),
+    'winword.exe': (0.05, ['spec.docx - Word']),
+    'explorer.exe': (0.09, ['', 'Downloads']),
+    'pycharm64.exe': (0.05, ['Performance_meter – run.py']),
+}
+SKILLS = ['python', 'sql', 'flask', 'django', 'aws', 'docker', 'kubernetes', 'react', 'typescript', 'java', 'c++',
+          'c#', 'pandas', 'spark', 'airflow', 'terraform', 'linux', 'git', 'rest', 'graphql', 'redis', 'postgres']
+FILLER = ['team', 'project', 'delivered', 'built', 'led', 'improved', 'customer', 'system', 'design', 'service',
+          'data', 'pipeline', 'testing', 'release', 'scale', 'latency', 'users', 'features', 'platform', 'support']
+
+
+def _duration(rnd: random.Random) -> float:
+    # heavy short tail (alt-tab flicker) plus long focused stretches; median ~20 s
+    return 0.3 + rnd.lognormvariate(math.log(20), 1.4)
+
+
+def _activity(rnd: random.Random, start: float, dur: float, keys_rate: float, sec: int = 60) -> Dict[str, Any]:
+    origin = start - start % sec
+    n = int((start + dur - origin) // sec) + 1
+    keys = [int(rnd.random() < 0.75) * int(rnd.uniform(0, 2 * keys_rate * sec)) for _ in range(n)]
+    mouse = [round(rnd.uniform(0, 3000), 1) if rnd.random() < 0.8 else 0.0 for _ in range(n)]
+    return {'t0': origin, 'sec': sec, 'keys': keys, 'words': [k // 6 for k in keys], 'backspaces': [k // 12 for k in keys],
+            'mouse': mouse, 'idle': [0 if (k or m) else 1 for k, m in zip(keys, mouse)]}
+
+
+def gen_metrics(out_dir: Path, days: int = 30, sessions_per_day: int = 400, app_mix: Optional[Dict[str, Tuple[float, List[str]]]] = None,
+                title_churn: float = 0.2, activity: bool = True, seed: int = 1, end_ts: Optional[float] = None) -> Dict[str, Any]:
+    # Writes metrics-YYYYMMDD.jsonl (+ titles-YYYYMMDD.jsonl) for `days` days ending today, in the agent's format.
+    # title_churn is the share of sessions whose title is new (a fresh document, tab or chat).
+    rnd = random.Random(seed)
+    mix = app_mix or APP_MIX
+    exes = list(mix)
+    weights = [mix[e][0] for e in exes]
+    cls = default_classifier()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    end_ts = end_ts or time.time()
+    rows_total = 0
+    for k in range(days):
+        t = time.localtime(end_ts - k * 86400)
+        day0 = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 9, 0, 0, 0, 0, -1))
+        date = time.strftime('%Y%m%d', t)
+        ts = day0
+        rows = []
+        for _ in range(sessions_per_day):
+            exe = rnd.choices(exes, weights)[0]
+            title = rnd.choice(mix[exe][1])
+            if rnd.random() < title_churn:
+                title = f'{title} ({rnd.randrange(10 ** 6)})'
+            dur = _duration(rnd)
+            keys_rate = rnd.uniform(0, 4) if exe in ('code.exe', 'pycharm64.exe', 'winword.exe', 'slack.exe') else rnd.uniform(0, 0.5)
+            s = {'exe': exe, 'title': title, 'start_ts': ts, 'end_ts': ts + dur, 'duration_sec': dur,
+                 'end_reason': 'switch', 'category': cls.classify(exe, title)}
+            if activity:
+                s['activity'] = _activity(rnd, ts, dur, keys_rate)
+                keys = sum(s['activity']['keys'])
+                s['active_sec'] = dur * (1 - sum(s['activity']['idle']) / len(s['activity']['idle']))
+                s['mouse_distance'] = float(sum(s['activity']['mouse']))
+            else:
+                keys = int(dur * keys_rate)
+                s['active_sec'] = dur
+                s['mouse_distance'] = dur * rnd.uniform(0, 200)
+            s.update(keys_pressed=keys, words_typed=keys // 6, backspaces=keys // 12)
+            rows.append(s)
+            ts += dur
+        rows = TitleDictionary(out_dir).encode(date, rows)
+        with (out_dir / f'metrics-{date}.jsonl').open('w', encoding='utf-8') as f:
+            for s in rows:
+                f.write(json.dumps(s, ensure_ascii=False) + '\n')
+        rows_total += len(rows)
+    return {'days': days, 'sessions': rows_total, 'bytes': sum(p.stat().st_size for p in out_dir.glob('*.jsonl'))}
+
+
+def resume_text(rnd: random.Random, words: int, skill_p: float = 0.05) -> str:
+    return ' '.join(rnd.choice(SKILLS) if rnd.random() < skill_p else rnd.choice(FILLER) for _ in range(words))
+
+
+def gen_portal(jobs: int = 3, applicants: int = 2000, words_mu: float = 600, words_sigma: float = 0.6,
+               seed: int = 1) -> Dict[str, Any]:
+    # Fills the job portal database at job_portal.app.DB_PATH: `applicants` spread over `jobs`, resume lengths
+    # lognormal around words_mu words, scored with basic_score as the apply route would.
+    from job_portal import app
+    rnd = random.Random(seed)
+    app.init_db()
+    con = app.db()
+    job_ids = []
+    for j in range(jobs):
+        desc = 'We need ' + ', '.join(rnd.sample(SKILLS, 6)) + ' experience; ' + resume_text(rnd, 60, 0.2)
+        cur = con.execute('INSERT INTO jobs(title, description, questions_json, created_at) VALUES (?,?,?,?)',
+                          (f'Engineer {j + 1}', desc, json.dumps(['Why us?', 'Notice period?']), time.time()))
+        job_ids.append((cur.lastrowid, desc))
+    for i in range(applicants):
+        job_id, desc = job_ids[i % jobs]
+        text = resume_text(rnd, max(20, int(rnd.lognormvariate(math.log(words_mu), words_sigma))))
+        answers = [resume_text(rnd, 20), f'{rnd.randrange(1, 12)} weeks']
+        rw, tw = app.text_features(text, answers)
+        cur = con.execute(
+            'INSERT INTO applicants(job_id, name, email, answers_json, resume_path, score, created_at, resume_words, text_words) '
+            'VALUES (?,?,?,?,?,?,?,?,?)',
+            (job_id, f'Applicant {i}', f'a{i}@example.com', json.dumps(answers), None,
+             app.basic_score(text, desc, answers, job_id=job_id), time.time(), rw, tw))
+        app.put_text(con, cur.lastrowid, text)
+    con.commit()
+    con.close()
+    return {'jobs': jobs, 'applicants': applicants, 'job_ids': [j for j, _ in job_ids]}
@@ -0,0 +1,103 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from perfmeter import query
+
+from .gen import gen_metrics
+
+# Rollup vs pure-scan parity for query.run_query. Synthetic day files (fixed seed) plus sessions the
+# aggregator writes into the next day's file: one that starts at 23:30 and is flushed after midnight, one held
+# back by the coalescer. Every spec runs with and without rollups; rows must match, the rollup run must use at
+# least one rollup, and the late sessions must count on the day they started. Exit status 1 otherwise.
+
+
+def _local(day0: float, hour: int, minute: int = 0) -> float:
+    t = time.localtime(day0)
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday, hour, minute, 0, 0, 0, -1))
+
+
+def add_late_sessions(data_dir: Path, day0: float) -> List[Dict[str, Any]]:
+    # appended to the file of the day after day0, as _flush_now would write them
+    late = [
+        {'exe': 'code.exe', 'title': 'late.py - project - Visual Studio Code', 'start_ts': _local(day0, 23, 30),
+         'duration_sec': 2400.0, 'active_sec': 2000.0, 'keys_pressed': 900, 'words_typed': 150, 'backspaces': 75,
+         'mouse_distance': 120.0, 'end_reason': 'switch', 'category': 'code'},
+        {'exe': 'slack.exe', 'title': '#general | corp - Slack', 'start_ts': _local(day0, 23, 58),
+         'duration_sec': 30.0, 'active_sec': 30.0, 'keys_pressed': 40, 'words_typed': 6, 'backspaces': 3,
+         'mouse_distance': 0.0, 'end_reason': 'switch', 'category': 'chat'},
+    ]
+    for s in late:
+        s['end_ts'] = s['start_ts'] + s['duration_sec']
+    name = time.strftime('%Y%m%d', time.localtime(_local(day0, 12) + 86400))
+    with (data_dir / f'metrics-{name}.jsonl').open('a', encoding='utf-8') as f:
+        for s in late:
+            f.write(json.dumps(s) + '\n')
+    return late
+
+
+def _rounded(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: round(v, 6) if isinstance(v, float) else v for k, v in r.items()} for r in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rollup vs scan parity for /api/query, with sessions crossing midnight')
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--sessions-per-day', type=int, default=300)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='perfmeter-query-') as tmp:
+        data_dir = Path(tmp)
+        gen_metrics(data_dir, args.days, args.sessions_per_day)
+        t = time.localtime(time.time() - 4 * 86400)
+        day0 = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1))
+        late = add_late_sessions(data_dir, day0)
+        day = time.strftime('%Y-%m-%d', t)
+        nxt = time.strftime('%Y-%m-%d', time.localtime(_local(day0, 12) + 86400))
+        first = time.strftime('%Y-%m-%d', time.localtime(time.time() - (args.days - 1) * 86400))
+        specs = [
+            {'from': day, 'to': nxt, 'group_by': 'day,hour'},
+            {'from': nxt, 'to': time.strftime('%Y-%m-%d', time.localtime(_local(day0, 12) + 2 * 86400)), 'group_by': 'day,hour'},
+            {'from': f'{day}T23', 'to': nxt, 'group_by': 'hour,exe', 'metrics': 'sessions,time_sec,words'},
+            {'from': first, 'group_by': 'day', 'metrics': 'sessions,time_sec,active_sec,words,keys,mouse,wpm'},
+            {'from': first, 'group_by': 'category'},
+            {'from': first, 'group_by': 'day,exe', 'exe': 'code.exe,slack.exe'},
+            {'from': f'{first}T10', 'to': f'{day}T23', 'group_by': 'hour', 'category': 'code'},
+        ]
+        report = []
+        failed = False
+        for spec in specs:
+            query._ROLLUPS.clear()
+            scan = query.run_query(data_dir, spec, use_rollups=False)
+            rolled = query.run_query(data_dir, spec)
+            ok = _rounded(scan['rows']) == _rounded(rolled['rows']) and rolled['plan']['rollup_days'] > 0
+            failed |= not ok
+            report.append({'spec': spec, 'ok': ok, 'rows': len(scan['rows']), 'scan_plan': scan['plan'],
+                           'rollup_plan': rolled['plan'], 'scan_ms': scan['elapsed_ms'], 'rollup_ms': rolled['elapsed_ms']})
+
+        # the late sessions count in the 23:00 bin of the day they started, and nowhere on the next day
+        late_hour = query.run_query(data_dir, {'from': f'{day}T23', 'to': nxt, 'group_by': 'hour'})['rows']
+        expected = sum(1 for _ in late)
+        late_ok = len(late_hour) == 1 and late_hour[0]['hour'] == f'{day}T23' and late_hour[0]['sessions'] >= expected
+        next_day = query.run_query(data_dir, {'from': nxt, 'to': f'{nxt}T01', 'group_by': 'hour'})['rows']
+        late_ok &= all(r['hour'] >= f'{nxt}T00' for r in next_day)
+        failed |= not late_ok
+
+    if args.json:
+        print(json.dumps({'specs': report, 'late_sessions_ok': late_ok}, indent=2))
+    else:
+        for r in report:
+            mark = 'ok' if r['ok'] else 'MISMATCH'
+            print(f"{mark:8s} rows {r['rows']:4d}  scan {r['scan_ms']:8.1f} ms  rollup {r['rollup_ms']:8.1f} ms "
+                  f"({r['rollup_plan']['rollup_days']} rollup days)  {json.dumps(r['spec'])}")
+        print(f"{'ok' if late_ok else 'MISMATCH':8s} sessions crossing midnight count on the day they started")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Tuple
+
+from .gen import gen_metrics, gen_portal
+
+# Offline benchmark suite: synthetic metrics logs and a synthetic job portal database are generated into a
+# temp dir (fixed seeds, so every run sees the same data), each case is timed `--repeat` times after one
+# warm-up call and reported by median. With a baseline, a case fails when its median exceeds
+# baseline * tolerance; exit status 1 on any failure. Baselines are machine-specific: record one with
+# --update-baseline on the machine that will run the comparison.
+BASELINE = Path(__file__).with_name('baseline.json')
+SCALES: Dict[str, Dict[str, Any]] = {
+    'small': {'days': 7, 'sessions_per_day': 200, 'title_churn': 0.2, 'jobs': 2, 'applicants': 300, 'words_mu': 400},
+    'default': {'days': 30, 'sessions_per_day': 600, 'title_churn': 0.2, 'jobs': 3, 'applicants': 2000, 'words_mu': 600},
+    'large': {'days': 90, 'sessions_per_day': 1500, 'title_churn': 0.3, 'jobs': 3, 'applicants': 10000, 'words_mu': 800},
+    'year': {'days': 365, 'sessions_per_day': 600, 'title_churn': 0.2, 'jobs': 3, 'applicants': 2000, 'words_mu': 600},
+}
+TOLERANCE = 1.5
+# cases that go through the logload process pool, timed per worker count by --scaling
+POOLED = ('stress_days', 'timeline_days')
+
+
+def timeit(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return {'median_ms': round(statistics.median(runs), 3), 'min_ms': round(min(runs), 3), 'max_ms': round(max(runs), 3)}
+
+
+def setup(work: Path, scale: Dict[str, Any]) -> Tuple[List[Tuple[str, Callable[[], Any]]], Dict[str, Any]]:
+    # env before import: the dashboard reads PERFMETER_DATA_DIR at import, the portal its page-cache switch
+    # (cached pages would time a dict lookup, not the route)
+    os.environ['PERFMETER_DATA_DIR'] = str(work / 'metrics')
+    os.environ['JOB_PORTAL_PAGE_CACHE'] = '0'
+    from perfmeter import dashboard
+    from job_portal import app as portal
+    dashboard.DATA_DIR = work / 'metrics'
+    portal.DATA_DIR = work / 'portal'
+    portal.UPLOADS = portal.DATA_DIR / 'uploads'
+    portal.INCOMING = portal.UPLOADS / '.incoming'
+    portal.DB_PATH = portal.DATA_DIR / 'job_portal.db'
+    portal.PAGE_CACHE_ENABLED = False
+
+    data = {
+        'metrics': gen_metrics(work / 'metrics', scale['days'], scale['sessions_per_day'], title_churn=scale['title_churn']),
+        'portal': gen_portal(scale['jobs'], scale['applicants'], scale['words_mu']),
+    }
+    days = scale['days']
+    sessions = dashboard.load_sessions_days(days)
+    job_id = data['portal']['job_ids'][0]
+    con = portal.db()
+    job = con.execute('SELECT description FROM jobs WHERE id=?', (job_id,)).fetchone()
+    rows = con.execute('SELECT id, answers_json FROM applicants WHERE job_id=?', (job_id,)).fetchall()
+    texts = portal.load_texts(con, [r['id'] for r in rows])
+    con.close()
+    scored = [(texts.get(r['id'], ''), json.loads(r['answers_json'] or '[]')) for r in rows]
+    client = portal.APP.test_client()
+
+    def get(url: str):
+        resp = client.get(url)
+        assert resp.status_code == 200, (url, resp.status_code)
+        return resp.data
+
+    def score_all():
+        for text, answers in scored:
+            portal.basic_score(text, job['description'], answers, job_id=job_id)
+
+    cases = [
+        ('summarize', lambda: dashboard.summarize(sessions)),
+        ('load_sessions_days', lambda: dashboard.load_sessions_days(days)),
+        ('stress_features', lambda: dashboard.stress_features(sessions, days)),
+        ('stress_days', lambda: dashboard.stress_features(dashboard.iter_sessions_days(days, dashboard.STRESS_FIELDS), days)),
+        ('timeline_days', lambda: (dashboard._DAY_TIMELINES.clear(), dashboard.timeline_days(days))),
+        ('basic_score', score_all),
+        ('candidates', lambda: get(f'/jp/job/{job_id}/candidates')),
+        ('candidates_skill', lambda: get(f'/jp/job/{job_id}/candidates?skill=python&min_words=100')),
+        ('propose_filters', lambda: get(f'/jp/job/{job_id}/filters/propose?target=10')),
+    ]
+    return cases, data
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    failed = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        res['baseline_ms'] = base['median_ms']
+        res['ratio'] = round(res['median_ms'] / base['median_ms'], 3) if base['median_ms'] else None
+        if res['median_ms'] > base['median_ms'] * tolerance:
+            failed.append(name)
+    return failed
+
+
+def scaling(cases: List[Tuple[str, Callable[[], Any]]], data: Dict[str, Any], args) -> None:
+    # no baseline here: speedups only mean something against the same machine's in-process time
+    pooled = [(name, fn) for name, fn in cases if name in POOLED and (not args.only or name in args.only)]
+    runs = {}
+    for workers in args.scaling:
+        os.environ['PERFMETER_LOAD_WORKERS'] = str(workers)
+        runs[workers] = {name: timeit(fn, args.repeat) for name, fn in pooled}
+    first = args.scaling[0]
+    for res in runs.values():
+        for name, r in res.items():
+            r['speedup'] = round(runs[first][name]['median_ms'] / r['median_ms'], 2) if r['median_ms'] else None
+    cpus = os.cpu_count() or 1
+    report = {'scale': args.scale, 'data': data, 'repeat': args.repeat, 'cpus': cpus,
+              'json_backend': sys.modules['perfmeter.logload'].BACKEND, 'workers': runs}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    m = data['metrics']
+    print(f"scale {args.scale}: {m['days']} days, {m['sessions']} sessions, {m['bytes'] / 1e6:.1f} MB; {cpus} CPUs")
+    for workers, res in runs.items():
+        print(f"workers {workers:2d}  " + '  '.join(f"{name} {r['median_ms']:9.2f} ms x{r['speedup']}" for name, r in res.items()))
+    if max(args.scaling) > cpus:
+        print(f"note: more workers than CPUs ({cpus}); those rows measure pool overhead, not scaling")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the dashboard and job portal hot paths')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='default')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', action='append', default=[], help='run only this case (repeatable)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='fail when median > baseline * tolerance')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--workers', type=int, help='loader processes for multi-day cases (PERFMETER_LOAD_WORKERS)')
+    parser.add_argument('--scaling', type=lambda v: [int(w) for w in v.split(',')],
+                        help='comma-separated worker counts (e.g. 0,1,2,4): time the pooled cases at each, report speedup over the first')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    if args.workers is not None:
+        os.environ['PERFMETER_LOAD_WORKERS'] = str(args.workers)
+
+    scale = SCALES[args.scale]
+    with tempfile.TemporaryDirectory(prefix='perfmeter-bench-') as tmp:
+        cases, data = setup(Path(tmp), scale)
+        if args.scaling:
+            return scaling(cases, data, args)
+        results = {name: timeit(fn, args.repeat) for name, fn in cases if not args.only or name in args.only}
+
+    stored = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline.exists() else {}
+    failed = []
+    if args.update_baseline:
+        # merge, so `--only <case> --update-baseline` refreshes that case and keeps the others' baselines
+        stored.setdefault(args.scale, {}).update({name: {'median_ms': r['median_ms']} for name, r in results.items()})
+        args.baseline.write_text(json.dumps(stored, indent=2) + '\n', encoding='utf-8')
+    else:
+        failed = compare(results, stored.get(args.scale, {}), args.tolerance)
+    report = {
+        'scale': args.scale, 'params': scale, 'data': data, 'repeat': args.repeat,
+        'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+        'json_backend': sys.modules['perfmeter.logload'].BACKEND,
+        'tolerance': args.tolerance, 'results': results, 'failed': failed,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        m = data['metrics']
+        print(f"scale {args.scale}: {m['days']} days, {m['sessions']} sessions, {m['bytes'] / 1e6:.1f} MB; "
+              f"{data['portal']['applicants']} applicants over {data['portal']['jobs']} jobs")
+        for name, r in results.items():
+            base = f"  base {r['baseline_ms']:9.2f} ms  x{r['ratio']}" if 'baseline_ms' in r else ''
+            mark = '  REGRESSION' if name in failed else ''
+            print(f"{name:20s} {r['median_ms']:9.2f} ms  (min {r['min_ms']:.2f}){base}{mark}")
+        if args.update_baseline:
+            print(f'baseline written to {args.baseline}')
+    sys.exit(1 if failed else 0)
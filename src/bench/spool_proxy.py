@@ -0,0 +1,185 @@
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# SpoolUploader -> flaky link -> collector, all on localhost. Spools `--days` of offline flushes, then drains
+# them through a proxy that drops a share of connections, half before the collector sees the request and
+# half after it has processed it (the reply is lost, so the agent retries an already-ingested batch).
+# Checks that every session reached the collector's shards exactly once; exit status 1 otherwise.
+
+
+class DropProxy(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, upstream: int, drop: float, seed: int):
+        super().__init__(('127.0.0.1', 0), ProxyHandler)
+        self.upstream = upstream
+        self.drop = drop
+        self.rnd = random.Random(seed)
+        self.counts = {'relayed': 0, 'dropped_before': 0, 'dropped_after': 0}
+        self.lock = threading.Lock()
+
+    def decide(self) -> str:
+        with self.lock:
+            r = self.rnd.random()
+            kind = 'relayed' if r >= self.drop else 'dropped_before' if r < self.drop / 2 else 'dropped_after'
+            self.counts[kind] += 1
+            return kind
+
+
+def _read_request(sock: socket.socket) -> bytes:
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return data
+        data += chunk
+    head, _, body = data.partition(b'\r\n\r\n')
+    length = 0
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value.strip())
+    while len(body) < length:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        body += chunk
+    # one request per upstream connection, so the collector's reply ends with its close
+    head = b'\r\n'.join(l for l in head.split(b'\r\n') if not l.lower().startswith(b'connection:'))
+    return head + b'\r\nConnection: close\r\n\r\n' + body
+
+
+class ProxyHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        request = _read_request(self.request)
+        if not request:
+            return
+        kind = self.server.decide()
+        if kind == 'dropped_before':
+            return
+        with socket.create_connection(('127.0.0.1', self.server.upstream)) as up:
+            up.sendall(request)
+            reply = b''
+            while True:
+                chunk = up.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+        if kind == 'relayed':
+            self.request.sendall(reply)
+
+
+def offline_flushes(days: int, flush_sec: int, seed: int) -> List[List[Dict[str, Any]]]:
+    rnd = random.Random(seed)
+    t = time.time() - days * 86400
+    out = []
+    for _ in range(days * 86400 // flush_sec):
+        batch = []
+        for _ in range(rnd.randint(1, 5)):
+            dur = rnd.uniform(1, flush_sec / 5)
+            batch.append({'exe': rnd.choice(['code.exe', 'chrome.exe', 'teams.exe', 'outlook.exe']), 'title': f'doc{rnd.randrange(200)}.py - project',
+                          'start_ts': round(t, 3), 'end_ts': round(t + dur, 3), 'duration_sec': round(dur, 3),
+                          'active_sec': round(dur * rnd.random(), 3), 'words_typed': rnd.randrange(60),
+                          'keys_pressed': rnd.randrange(400), 'backspaces': rnd.randrange(30),
+                          'mouse_distance': round(rnd.uniform(0, 5000), 1), 'category': 'code'})
+            t += dur
+        t += flush_sec - sum(s['duration_sec'] for s in batch)
+        out.append(batch)
+    return out
+
+
+def run_once(drop: float, request_kb: int, days: int, flush_sec: int, seed: int) -> Dict[str, Any]:
+    from perfmeter import collector
+    from perfmeter.uploader import CollectorClient, SpoolUploader
+    from werkzeug.serving import make_server
+
+    with tempfile.TemporaryDirectory(prefix='perfmeter-spool-') as tmp:
+        tmp = Path(tmp)
+        collector.DATA_DIR = tmp / 'collector'
+        collector.init_db()
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, collector.APP, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        proxy = DropProxy(server.server_port, drop, seed)
+        threading.Thread(target=proxy.serve_forever, daemon=True).start()
+
+        client = CollectorClient(f'http://127.0.0.1:{proxy.server_address[1]}', device='bench-device', team='bench', timeout=5)
+        up = SpoolUploader(tmp / 'spool', client, max_request_bytes=request_kb * 1024,
+                           backoff_base_sec=0.001, backoff_max_sec=0.01)
+        flushes = offline_flushes(days, flush_sec, seed)
+        for batch in flushes:
+            up.enqueue(batch)
+        raw_bytes = sum(len(json.dumps(s, separators=(',', ':'))) for b in flushes for s in b)
+        sent = {s['start_ts'] for b in flushes for s in b}
+
+        t0 = time.perf_counter()
+        devnull = open(os.devnull, 'w')
+        stdout, sys.stdout = sys.stdout, devnull  # the uploader logs every retry streak
+        try:
+            while up._files():
+                if not up.drain():
+                    time.sleep(up.backoff_sec())
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+        elapsed = time.perf_counter() - t0
+        server.shutdown()
+        proxy.shutdown()
+        proxy.server_close()
+
+        got: Dict[float, int] = {}
+        for f in (collector.DATA_DIR / 'devices' / 'bench-device').glob('*.jsonl'):
+            for line in f.read_text(encoding='utf-8').splitlines():
+                ts = json.loads(line)['start_ts']
+                got[ts] = got.get(ts, 0) + 1
+        rolled = collector.db().execute('SELECT COALESCE(SUM(sessions), 0) FROM rollups').fetchone()[0]
+        n = len(sent)
+        return {
+            'drop': drop, 'request_kb': request_kb, 'flushes': len(flushes), 'sessions': n,
+            'missing': len(sent - set(got)), 'duplicates': sum(c - 1 for c in got.values() if c > 1), 'rollup_sessions': rolled,
+            'proxy': proxy.counts, 'uploader': dict(up.stats),
+            'elapsed_sec': round(elapsed, 2), 'sessions_per_sec': round(n / elapsed) if elapsed else 0,
+            'wire_bytes_per_session': round(up.stats['bytes'] / n, 1), 'raw_json_bytes_per_session': round(raw_bytes / n, 1),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Spooled upload through a connection-dropping proxy')
+    parser.add_argument('--drop', type=float, action='append', help='share of dropped connections (repeatable; default 0 and 0.4)')
+    parser.add_argument('--request-kb', type=int, action='append', help='max spool KB per request (repeatable; default 512 and 8)')
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--flush-sec', type=int, default=180)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    runs = [run_once(d, kb, args.days, args.flush_sec, args.seed)
+            for d, kb in zip(args.drop or [0.0, 0.4], args.request_kb or [512, 8])]
+    failed = any(r['missing'] or r['duplicates'] or r['rollup_sessions'] != r['sessions'] for r in runs)
+    if args.json:
+        print(json.dumps(runs, indent=2))
+    else:
+        for r in runs:
+            p = r['proxy']
+            print(f"drop {r['drop']:.0%} req {r['request_kb']} KB: {r['sessions']} sessions / {r['flushes']} flushes in "
+                  f"{r['elapsed_sec']} s ({r['sessions_per_sec']}/s), {r['wire_bytes_per_session']} B/session on the wire "
+                  f"(raw JSON {r['raw_json_bytes_per_session']}); requests {r['uploader']['requests']}, "
+                  f"dropped {p['dropped_before']} before / {p['dropped_after']} after ingest; "
+                  f"missing {r['missing']}, duplicates {r['duplicates']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,31 @@
+import gzip
+import hashlib
 import os
+import threading
 import re
+import shutil
 import sqlite3
+import zlib
 import json
 import time
+from collections import OrderedDict
+from functools import wraps
 from pathlib import Path
 from typing import List, Dict, Any
 
-from flask import Flask, request, redirect, url_for, render_template_string, send_from_directory, jsonify
+from flask import Flask, Request, request, redirect, url_for, send_file, jsonify
+from werkzeug.exceptions import BadRequest
 from werkzeug.utils import secure_filename
-from PyPDF2 import PdfReader
-from docx import Document
+
+try:
+    # request/SQL timings from the perfmeter package; without it the portal runs unmeasured
+    from perfmeter import instrument
+    timed = instrument.timed
+except Exception:
+    instrument = None  # type: ignore
+
+    def timed(name: str, **labels):
+        return lambda fn: fn
 
 ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = ROOT / 'data' / 'job_portal'
@@ -17,13 +33,137 @@ UPLOADS = DATA_DIR / 'uploads'
 DB_PATH = DATA_DIR / 'job_portal.db'
 
 ALLOWED_EXT = {'.pdf', '.docx', '.txt'}
+INCOMING = UPLOADS / '.incoming'
+SNIFF_BYTES = 512
+
+
+def sniff_type(head: bytes) -> str:
+    if head.startswith(b'%PDF-'):
+        return '.pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return '.docx'
+    if b'\x00' not in head:
+        return '.txt'
+    return ''
+
+
+class UploadSpool:
+    # Writable file object the multipart parser streams into: the first block is sniffed
+    # (magic bytes must match the file extension), then chunks go straight to a temp file
+    # under UPLOADS so commit() is an atomic rename into the content-addressed shard. A rejected part is discarded at once and
+    # the rest of its bytes are dropped rather than buffered (the dev server would otherwise
+    # drain the unread body in 10 MB reads after an early error response).
+    def __init__(self, filename: str):
+        INCOMING.mkdir(parents=True, exist_ok=True)
+        self.ext = Path(secure_filename(filename or '')).suffix.lower()
+        self.path = INCOMING / f"{os.getpid()}_{time.time_ns()}_{id(self)}.part"
+        self._f = self.path.open('w+b')
+        self._head = b''
+        self.sniffed = False
+        self.rejected = False
+        self.committed = False
+        self.size = 0
+        self._sha = hashlib.sha256()
+
+    def _sniff(self):
+        self.sniffed = True
+        if self.ext not in ALLOWED_EXT or sniff_type(self._head) != self.ext:
+            self.rejected = True
+            self.discard()
+
+    def write(self, data: bytes) -> int:
+        if not self.sniffed:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        self.size += len(data)
+        if self.rejected:
+            return len(data)
+        self._sha.update(data)
+        return self._f.write(data)
+
+    def seek(self, *args):
+        # the parser seeks to 0 once the part is complete; short files are sniffed here
+        if not self.sniffed:
+            self._sniff()
+        if self.rejected:
+            raise BadRequest('Unsupported file type')
+        return self._f.seek(*args)
+
+    def commit(self) -> Path:
+        dest = resume_storage_path(self._sha.hexdigest(), self.ext)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        self._f.close()
+        os.replace(self.path, dest)
+        self.committed = True
+        return dest
+
+    def discard(self):
+        self._f.close()
+        if not self.committed:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        self.discard()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def resume_storage_path(digest: str, ext: str) -> Path:
+    # sharded by hash prefix (uploads/ab/cd/abcd....pdf) to keep directories small
+    return UPLOADS / digest[:2] / digest[2:4] / f"{digest}{ext}"
+
+
+def resume_file(resume_path: str) -> Path:
+    # rows store paths relative to UPLOADS; older rows hold absolute paths
+    p = Path(resume_path or '')
+    return p if p.is_absolute() else UPLOADS / p
+
+
+def store_upload(file) -> Path:
+    spool = file.stream
+    if not isinstance(spool, UploadSpool):
+        spool = UploadSpool(file.filename or '')
+        try:
+            shutil.copyfileobj(file.stream, spool, 64 * 1024)
+            spool.seek(0)
+        except Exception:
+            spool.discard()
+            raise
+    return spool.commit()
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = UploadSpool(filename or '')
+        self.__dict__.setdefault('_spools', []).append(spool)
+        return spool
+
+    def close(self):
+        super().close()
+        # also drops spools of parts that never completed (client disconnect, rejected type)
+        for spool in self.__dict__.get('_spools', []):
+            spool.discard()
+
+
 APP = Flask(__name__)
+APP.request_class = UploadRequest
 APP.config['MAX_CONTENT_LENGTH'] = 20 * 1024 * 1024
+APP.config['USE_X_SENDFILE'] = os.getenv('JOB_PORTAL_X_SENDFILE', '0') == '1'
+# registered first so its after_request runs last and the timing includes compression
+if instrument is not None:
+    instrument.install_flask(APP, 'job_portal')
 try:
     # Reuse Gemini client from perfmeter package
     from perfmeter.gemini_client import GeminiClient  # type: ignore
+    from perfmeter.llm_response import FILTERS_SCHEMA  # type: ignore
 except Exception:
     GeminiClient = None  # type: ignore
+    FILTERS_SCHEMA = None  # type: ignore
 
 
 def ensure_dirs():
@@ -33,7 +173,10 @@ def ensure_dirs():
 
 def db():
     ensure_dirs()
-    con = sqlite3.connect(DB_PATH)
+    if instrument is not None:
+        con = sqlite3.connect(DB_PATH, factory=instrument.connection_factory())
+    else:
+        con = sqlite3.connect(DB_PATH)
     con.row_factory = sqlite3.Row
     return con
 
@@ -64,14 +207,137 @@ def init_db():
             resume_text TEXT,
             score REAL DEFAULT 0,
             created_at REAL,
+            resume_words INTEGER DEFAULT 0,
+            text_words INTEGER DEFAULT 0,
             FOREIGN KEY(job_id) REFERENCES jobs(id)
         )
         """
     )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS applicant_texts (
+            applicant_id INTEGER PRIMARY KEY,
+            codec TEXT NOT NULL,
+            body BLOB,
+            FOREIGN KEY(applicant_id) REFERENCES applicants(id)
+        )
+        """
+    )
+    # change counter bumped by triggers on every write; keys the page cache
+    cur.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)')
+    cur.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('changes', 0)")
+    for table in ('jobs', 'applicants', 'applicant_texts'):
+        for op in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_{op.lower()}_changes AFTER {op} ON {table} "
+                "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'changes'; END"
+            )
     con.commit()
+    migrate_db(con)
     con.close()
 
 
+_DB_READY = set()
+
+
+def ensure_db():
+    # init_db once per database path instead of on every request
+    if str(DB_PATH) not in _DB_READY:
+        init_db()
+        _DB_READY.add(str(DB_PATH))
+
+
+def db_version(con: sqlite3.Connection) -> int:
+    row = con.execute("SELECT value FROM meta WHERE key='changes'").fetchone()
+    return row['value'] if row else 0
+
+
+_VERSION_CON = threading.local()
+
+
+def current_version() -> int:
+    # The change counter through one long-lived connection per server thread: a cache hit costs a single
+    # indexed read instead of a connect. Still read from the DB, not kept in memory, so writes from other
+    # processes (bulk import, a second worker) invalidate too. Autocommit reads see the latest commit.
+    con = getattr(_VERSION_CON, 'con', None)
+    if con is None or getattr(_VERSION_CON, 'path', None) != DB_PATH:
+        if con is not None:
+            con.close()
+        con = sqlite3.connect(DB_PATH)
+        con.row_factory = sqlite3.Row
+        _VERSION_CON.con, _VERSION_CON.path = con, DB_PATH
+    return db_version(con)
+
+
+# Hot applicant columns; resume text lives in applicant_texts and is loaded via load_texts().
+APPLICANT_COLS = 'id, job_id, name, email, answers_json, resume_path, score, resume_words, text_words, created_at'
+COMPRESS_TEXT = os.getenv('JOB_PORTAL_COMPRESS_TEXT', '0') == '1'
+SCHEMA_VERSION = 1
+
+
+def migrate_db(con: sqlite3.Connection):
+    version = con.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    cols = {r['name'] for r in con.execute('PRAGMA table_info(applicants)').fetchall()}
+    for col in ('resume_words', 'text_words'):
+        if col not in cols:
+            con.execute(f'ALTER TABLE applicants ADD COLUMN {col} INTEGER DEFAULT 0')
+    # v1: move inline resume_text into applicant_texts and fill word-count features
+    ids = [r['id'] for r in con.execute('SELECT id FROM applicants WHERE resume_text IS NOT NULL').fetchall()]
+    for i in range(0, len(ids), 500):
+        part = ids[i:i+500]
+        q = f"SELECT id, resume_text, answers_json FROM applicants WHERE id IN ({','.join('?' * len(part))})"
+        for r in con.execute(q, part).fetchall():
+            put_text(con, r['id'], r['resume_text'])
+            rw, tw = text_features(r['resume_text'], json.loads(r['answers_json'] or '[]'))
+            con.execute('UPDATE applicants SET resume_text=NULL, resume_words=?, text_words=? WHERE id=?', (rw, tw, r['id']))
+    con.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    con.commit()
+    if ids:
+        con.execute('VACUUM')
+
+
+def text_features(resume_text: str, answers: List[str]):
+    resume_words = len((resume_text or '').split())
+    return resume_words, resume_words + len(' '.join(answers or []).split())
+
+
+def encode_text(text: str):
+    raw = (text or '').encode('utf-8')
+    if COMPRESS_TEXT and len(raw) > 256:
+        return 'zlib', zlib.compress(raw, 6)
+    return 'raw', raw
+
+
+def decode_text(codec: str, body: bytes) -> str:
+    if body is None:
+        return ''
+    if codec == 'zlib':
+        body = zlib.decompress(body)
+    return bytes(body).decode('utf-8')
+
+
+def put_text(con: sqlite3.Connection, applicant_id: int, text: str):
+    codec, body = encode_text(text)
+    con.execute('INSERT OR REPLACE INTO applicant_texts(applicant_id, codec, body) VALUES (?,?,?)', (applicant_id, codec, body))
+
+
+def load_texts(con: sqlite3.Connection, ids: List[int]) -> Dict[int, str]:
+    out: Dict[int, str] = {}
+    ids = list(ids)
+    for i in range(0, len(ids), 500):
+        part = ids[i:i+500]
+        q = f"SELECT applicant_id, codec, body FROM applicant_texts WHERE applicant_id IN ({','.join('?' * len(part))})"
+        for r in con.execute(q, part).fetchall():
+            out[r['applicant_id']] = decode_text(r['codec'], r['body'])
+    return out
+
+
+def full_text(resume_text: str, answers_json: str) -> str:
+    return (resume_text or '') + '\n' + ' '.join(json.loads(answers_json or '[]'))
+
+
 INDEX_HTML = """
 <!doctype html>
 <html>
@@ -243,6 +509,13 @@ CANDIDATES_HTML = """
         <input class="border border-slate-300 rounded px-3 py-2 bg-white focus:ring-2 focus:ring-blue-500" name="min_words" value="{{ min_words }}" placeholder="Min words (resume+answers)" />
         <button class="bg-blue-600 text-white px-3 py-2 rounded hover:bg-blue-700">Filter</button>
       </div>
+      <div class="grid grid-cols-1 md:grid-cols-4 gap-3 mt-3">
+        <select name="sort" class="border border-slate-300 rounded px-3 py-2 bg-white focus:ring-2 focus:ring-blue-500">
+          <option value="score" {% if sort != 'semantic' %}selected{% endif %}>Sort: keyword score</option>
+          <option value="semantic" {% if sort == 'semantic' %}selected{% endif %}>Sort: semantic match</option>
+        </select>
+        <input class="md:col-span-3 border border-slate-300 rounded px-3 py-2 bg-white focus:ring-2 focus:ring-blue-500" name="sq" value="{{ sq }}" placeholder="Semantic query (default: job description)" />
+      </div>
     </form>
 
     <div class="bg-white shadow-sm ring-1 ring-slate-200 rounded-lg p-4 mb-4">
@@ -269,7 +542,7 @@ CANDIDATES_HTML = """
     <div class="bg-white shadow-sm ring-1 ring-slate-200 rounded-lg overflow-hidden">
       <table class="min-w-full text-sm">
         <thead class="bg-slate-50 text-left text-slate-600 border-b">
-          <tr><th class="py-2 px-3">Name</th><th class="py-2 px-3">Email</th><th class="py-2 px-3">Score</th><th class="py-2 px-3">Actions</th></tr>
+          <tr><th class="py-2 px-3">Name</th><th class="py-2 px-3">Email</th><th class="py-2 px-3">Score</th>{% if sort == 'semantic' %}<th class="py-2 px-3">Match</th>{% endif %}<th class="py-2 px-3">Actions</th></tr>
         </thead>
         <tbody class="divide-y divide-slate-100">
           {% for a in applicants %}
@@ -277,7 +550,8 @@ CANDIDATES_HTML = """
             <td class="py-2 px-3">{{ a['name'] }}</td>
             <td class="py-2 px-3">{{ a['email'] }}</td>
             <td class="py-2 px-3">{{ '%.2f'|format(a['score'] or 0) }}</td>
-            <td class="py-2 px-3"><a class="text-blue-700 underline" href="{{ url_for('download_resume', path=a['resume_path']) }}">Resume</a></td>
+            {% if sort == 'semantic' %}<td class="py-2 px-3">{{ '%.3f'|format(match.get(a['id'], 0)) }}</td>{% endif %}
+            <td class="py-2 px-3"><a class="text-blue-700 underline" href="{{ url_for('download_resume', applicant_id=a['id']) }}">Resume</a></td>
           </tr>
           {% endfor %}
         </tbody>
@@ -310,45 +584,268 @@ async function runPropose(){
 """
 
 
-def parse_resume_to_text(path: Path) -> str:
+# Extraction caps: bound time/memory for huge or hostile uploads. The extracted text is what keyword search,
+# skill filters and the semantic index read, so it is kept whole up to these caps.
+EXTRACT_MAX_PAGES = int(os.getenv('JOB_PORTAL_EXTRACT_MAX_PAGES', '50'))
+EXTRACT_MAX_CHARS = int(os.getenv('JOB_PORTAL_EXTRACT_MAX_CHARS', '200000'))
+EXTRACT_MAX_SEC = float(os.getenv('JOB_PORTAL_EXTRACT_MAX_SEC', '10'))
+
+
+def iter_resume_text(path: Path, max_pages: int = EXTRACT_MAX_PAGES):
+    # Yields text page by page (PDF), in paragraph blocks (DOCX) or in chunks (TXT); for a PDF with more
+    # than max_pages pages, a final None marks that the rest was skipped.
+    ext = path.suffix.lower()
+    # parsers are imported on first use (~100 ms together); most requests never read a resume
+    if ext == '.pdf':
+        from PyPDF2 import PdfReader
+        with path.open('rb') as f:
+            reader = PdfReader(f)
+            for i, page in enumerate(reader.pages):
+                if i >= max_pages:
+                    yield None
+                    return
+                yield page.extract_text() or ''
+    elif ext == '.docx':
+        from docx import Document
+        doc = Document(str(path))
+        block: List[str] = []
+        for p in doc.paragraphs:
+            block.append(p.text)
+            if len(block) >= 50:
+                yield '\n'.join(block)
+                block = []
+        if block:
+            yield '\n'.join(block)
+    elif ext == '.txt':
+        with path.open('r', encoding='utf-8', errors='ignore') as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+
+
+def extract_resume(path: Path, max_pages: int = EXTRACT_MAX_PAGES, max_chars: int = EXTRACT_MAX_CHARS,
+                   max_sec: float = EXTRACT_MAX_SEC):
+    # Returns (text, stats); partial text is kept when a cap is hit or the parser fails midway.
+    t0 = time.perf_counter()
+    parts: List[str] = []
+    chars = 0
+    blocks = 0
+    stop = None
+    error = None
+    gen = iter_resume_text(path, max_pages=max_pages)
     try:
-        if path.suffix.lower() == '.pdf':
-            text = []
-            with path.open('rb') as f:
-                reader = PdfReader(f)
-                for page in reader.pages:
-                    text.append(page.extract_text() or '')
-            return '\n'.join(text)
-        elif path.suffix.lower() == '.docx':
-            doc = Document(str(path))
-            return '\n'.join(p.text for p in doc.paragraphs)
-        elif path.suffix.lower() == '.txt':
-            return path.read_text(encoding='utf-8', errors='ignore')
-    except Exception:
-        return ''
-    return ''
+        for block in gen:
+            if block is None:
+                stop = 'pages'
+                break
+            blocks += 1
+            if chars + len(block) > max_chars:
+                block = block[:max_chars - chars]
+            parts.append(block)
+            chars += len(block)
+            if chars >= max_chars:
+                stop = 'chars'
+                break
+            if time.perf_counter() - t0 > max_sec:
+                stop = 'time'
+                break
+    except Exception as e:
+        error = str(e)
+    finally:
+        gen.close()
+    stats = {
+        'file': path.name,
+        'bytes': path.stat().st_size if path.exists() else 0,
+        'blocks': blocks,
+        'chars': chars,
+        'elapsed_sec': time.perf_counter() - t0,
+        'stopped': stop,
+        'error': error,
+    }
+    return '\n'.join(parts), stats
+
+
+@timed('resume_parse_seconds')
+def parse_resume_to_text(path: Path) -> str:
+    text, stats = extract_resume(path)
+    APP.logger.info('resume extracted %s', json.dumps(stats))
+    return text
+
+
+TOKEN_RE = re.compile(r"[a-z0-9+#\.]{2,}")
+# maps ASCII separators to spaces so str.split() yields the same tokens as TOKEN_RE
+_SEP_TABLE = {i: ' ' for i in range(128) if not (chr(i).isalnum() or chr(i) in '+#.')}
+
+
+class JobMatcher:
+    # Keywords compiled once per job description; scoring is a single tokenizing pass over the text.
+    def __init__(self, job_desc: str):
+        self.job_desc = job_desc or ''
+        words = TOKEN_RE.findall(self.job_desc.lower())
+        keywords = [w.rstrip('.') for w in words if w.isalpha() or any(c in w for c in ['#','+','.',])]
+        self.keywords = frozenset(k for k in keywords if len(k) >= 2)
+
+    def score(self, text: str, answers: List[str]) -> float:
+        text_all = ((text or '') + '\n' + '\n'.join(answers or [])).lower()
+        if self.keywords:
+            tokens = set(text_all.translate(_SEP_TABLE).split())
+            tokens.update([t.rstrip('.') for t in tokens if t.endswith('.')])
+            density = len(self.keywords & tokens) / len(self.keywords)
+        else:
+            density = 0.0
+        length = len(text_all.split())
+        return 0.7 * density + 0.3 * min(1.0, length / 2000)
+
+
+MATCHER_CACHE_SIZE = 64
+_MATCHERS: 'OrderedDict[Any, JobMatcher]' = OrderedDict()
+_MATCHERS_LOCK = threading.Lock()
+
+
+def job_matcher(job_id: Any, job_desc: str) -> JobMatcher:
+    # LRU of the most recently scored jobs; an entry is replaced when its description (keywords) changes
+    with _MATCHERS_LOCK:
+        m = _MATCHERS.get(job_id)
+        if m is not None and m.job_desc == (job_desc or ''):
+            _MATCHERS.move_to_end(job_id)
+            return m
+    m = JobMatcher(job_desc)
+    with _MATCHERS_LOCK:
+        _MATCHERS[job_id] = m
+        _MATCHERS.move_to_end(job_id)
+        if len(_MATCHERS) > MATCHER_CACHE_SIZE:
+            _MATCHERS.popitem(last=False)
+    return m
+
+
+@timed('basic_score_seconds')
+def basic_score(text: str, job_desc: str, answers: List[str], job_id: Any = None) -> float:
+    return job_matcher(job_id, job_desc).score(text, answers)
+
+
+def migrate_uploads(con: sqlite3.Connection) -> int:
+    # moves flat/legacy resume files into the sharded layout and rewrites resume_path
+    moved = 0
+    rows = con.execute('SELECT id, resume_path FROM applicants WHERE resume_path IS NOT NULL').fetchall()
+    for r in rows:
+        src = resume_file(r['resume_path'])
+        if not src.is_file():
+            continue
+        sha = hashlib.sha256()
+        with src.open('rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        dest = resume_storage_path(sha.hexdigest(), src.suffix.lower())
+        if src != dest:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(src, dest)
+            moved += 1
+        rel = dest.relative_to(UPLOADS).as_posix()
+        if rel != r['resume_path']:
+            con.execute('UPDATE applicants SET resume_path=? WHERE id=?', (rel, r['id']))
+    con.commit()
+    return moved
+
+
+def rescore_job(con: sqlite3.Connection, job_id: int) -> int:
+    job = con.execute('SELECT id, description FROM jobs WHERE id=?', (job_id,)).fetchone()
+    if not job:
+        return 0
+    m = job_matcher(job_id, job['description'] or '')
+    rows = con.execute('SELECT id, answers_json FROM applicants WHERE job_id=?', (job_id,)).fetchall()
+    texts = load_texts(con, [r['id'] for r in rows])
+    updates = [(float(m.score(texts.get(r['id'], ''), json.loads(r['answers_json'] or '[]'))), r['id']) for r in rows]
+    con.executemany('UPDATE applicants SET score=? WHERE id=?', updates)
+    con.commit()
+    return len(updates)
+
+
+# Templates are compiled once; render_template_string recompiled the source on every request.
+TEMPLATES = {name: APP.jinja_env.from_string(src) for name, src in (
+    ('index', INDEX_HTML), ('new_job', NEW_JOB_HTML), ('job', JOB_HTML), ('apply', APPLY_HTML), ('candidates', CANDIDATES_HTML),
+)}
+
+
+def render(name: str, **context) -> str:
+    APP.update_template_context(context)
+    return TEMPLATES[name].render(context)
+
+
+PAGE_CACHE_ENABLED = os.getenv('JOB_PORTAL_PAGE_CACHE', '1') != '0'
+PAGE_CACHE_MAX = int(os.getenv('JOB_PORTAL_PAGE_CACHE_MAX', '256'))
+GZIP_MIN_BYTES = 1024
+_PAGE_CACHE: 'OrderedDict[Any, Dict[str, Any]]' = OrderedDict()
+_PAGE_CACHE_LOCK = threading.Lock()
+
 
+def accepts_gzip() -> bool:
+    return 'gzip' in (request.headers.get('Accept-Encoding') or '').lower()
 
-def basic_score(text: str, job_desc: str, answers: List[str]) -> float:
-    text_all = (text or '') + '\n' + (job_desc or '') + '\n' + '\n'.join(answers or [])
-    text_all = text_all.lower()
-    # naive keyword weight from job description
-    words = re.findall(r"[a-zA-Z0-9+#\.]{2,}", job_desc.lower()) if job_desc else []
-    keywords = [w for w in words if w.isalpha() or any(c in w for c in ['#','+','.',])]
-    uniq = list(dict.fromkeys(keywords))
-    hits = sum(1 for k in uniq if k in text_all)
-    density = hits / max(1, len(uniq))
-    length = len(text_all.split())
-    return 0.7 * density + 0.3 * min(1.0, length / 2000)
+
+def cached_page(fn):
+    # Caches rendered GET pages keyed by URL and the DB change counter; any write invalidates.
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not PAGE_CACHE_ENABLED:
+            return fn(*args, **kwargs)
+        ensure_db()
+        version = current_version()
+        key = (request.url_root, request.full_path)
+        with _PAGE_CACHE_LOCK:
+            ent = _PAGE_CACHE.get(key)
+            if ent is not None:
+                _PAGE_CACHE.move_to_end(key)
+        if ent is None or ent['version'] != version:
+            resp = APP.make_response(fn(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+            body = resp.get_data()
+            ent = {'version': version, 'body': body, 'gz': None, 'mimetype': resp.mimetype,
+                   'etag': f"{version}-{hashlib.sha1(body).hexdigest()[:16]}"}
+            with _PAGE_CACHE_LOCK:
+                _PAGE_CACHE[key] = ent
+                while len(_PAGE_CACHE) > PAGE_CACHE_MAX:
+                    _PAGE_CACHE.popitem(last=False)
+        if request.if_none_match.contains(ent['etag']):
+            resp = APP.response_class(status=304)
+        elif accepts_gzip() and len(ent['body']) >= GZIP_MIN_BYTES:
+            if ent['gz'] is None:
+                ent['gz'] = gzip.compress(ent['body'], 6)
+            resp = APP.response_class(ent['gz'], mimetype=ent['mimetype'])
+            resp.headers['Content-Encoding'] = 'gzip'
+        else:
+            resp = APP.response_class(ent['body'], mimetype=ent['mimetype'])
+        resp.set_etag(ent['etag'])
+        resp.headers['Vary'] = 'Accept-Encoding'
+        return resp
+    return wrapper
+
+
+@APP.after_request
+def compress_response(resp):
+    # gzip for uncached HTML/JSON responses; file downloads (direct_passthrough) are left alone
+    if (resp.direct_passthrough or resp.status_code != 200 or 'Content-Encoding' in resp.headers
+            or resp.mimetype not in ('text/html', 'application/json') or not accepts_gzip()):
+        return resp
+    body = resp.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return resp
+    resp.set_data(gzip.compress(body, 6))
+    resp.headers['Content-Encoding'] = 'gzip'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return resp
 
 
 @APP.route('/jp/')
+@cached_page
 def index():
-    init_db()
+    ensure_db()
     con = db()
     rows = con.execute('SELECT * FROM jobs ORDER BY id DESC').fetchall()
     con.close()
-    return render_template_string(INDEX_HTML, jobs=rows)
+    return render('index', jobs=rows)
 
 
 @APP.route('/')
@@ -358,7 +855,7 @@ def root_redirect():
 
 @APP.route('/jp/job/new', methods=['GET','POST'])
 def new_job():
-    init_db()
+    ensure_db()
     if request.method == 'POST':
         title = request.form.get('title','').strip()
         description = request.form.get('description','')
@@ -370,10 +867,11 @@ def new_job():
         job_id = con.execute('SELECT last_insert_rowid() as id').fetchone()['id']
         con.commit(); con.close()
         return redirect(url_for('job_detail', job_id=job_id))
-    return render_template_string(NEW_JOB_HTML)
+    return render('new_job')
 
 
 @APP.route('/jp/job/<int:job_id>')
+@cached_page
 def job_detail(job_id: int):
     con = db()
     job = con.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
@@ -382,7 +880,7 @@ def job_detail(job_id: int):
         return 'Not found', 404
     questions = json.loads(job['questions_json'] or '[]')
     apply_url = request.url_root.strip('/') + url_for('apply', job_id=job_id)
-    return render_template_string(JOB_HTML, job=job, questions=questions, apply_url=apply_url)
+    return render('job', job=job, questions=questions, apply_url=apply_url)
 
 
 @APP.route('/jp/apply/<int:job_id>', methods=['GET','POST'])
@@ -407,25 +905,41 @@ def apply(job_id: int):
         if ext not in ALLOWED_EXT:
             return 'Unsupported file type', 400
         ensure_dirs()
-        save_path = UPLOADS / f"{int(time.time()*1000)}_{fname}"
-        file.save(str(save_path))
+        save_path = store_upload(file)
         resume_text = parse_resume_to_text(save_path)
-        score = basic_score(resume_text, job['description'] or '', answers)
+        score = basic_score(resume_text, job['description'] or '', answers, job_id=job_id)
+        resume_words, text_words = text_features(resume_text, answers)
         con = db()
-        con.execute('INSERT INTO applicants(job_id,name,email,answers_json,resume_path,resume_text,score,created_at) VALUES (?,?,?,?,?,?,?,?)', (
-            job_id, name, email, json.dumps(answers), str(save_path), resume_text, float(score), time.time()
+        cur = con.execute('INSERT INTO applicants(job_id,name,email,answers_json,resume_path,score,created_at,resume_words,text_words) VALUES (?,?,?,?,?,?,?,?,?)', (
+            job_id, name, email, json.dumps(answers), save_path.relative_to(UPLOADS).as_posix(), float(score), time.time(), resume_words, text_words
         ))
+        applicant_id = cur.lastrowid
+        put_text(con, applicant_id, resume_text)
         con.commit(); con.close()
+        try:
+            from . import vector_index
+            vector_index.add_applicant(job_id, applicant_id, full_text(resume_text, json.dumps(answers)))
+        except Exception as e:
+            # the index catches up on next query (vector_index.sync); never fail an application on it
+            APP.logger.warning('vector index add failed: %s', e)
         return 'Application submitted. Thank you!'
-    return render_template_string(APPLY_HTML, job=job, questions=questions, enumerate=enumerate)
+    return render('apply', job=job, questions=questions, enumerate=enumerate)
 
 
-@APP.route('/jp/resume/<path:path>')
-def download_resume(path: str):
-    p = Path(path)
-    if not p.exists():
+@APP.route('/jp/applicant/<int:applicant_id>/resume')
+def download_resume(applicant_id: int):
+    con = db()
+    row = con.execute('SELECT id, resume_path FROM applicants WHERE id=?', (applicant_id,)).fetchone()
+    con.close()
+    if not row or not row['resume_path']:
         return 'Not found', 404
-    return send_from_directory(p.parent, p.name, as_attachment=True)
+    p = resume_file(row['resume_path'])
+    if not p.is_file():
+        return 'Not found', 404
+    # conditional=True gives ETag / Last-Modified / Range handling; the body goes through
+    # wsgi.file_wrapper, which servers map to sendfile (or X-Sendfile with USE_X_SENDFILE)
+    return send_file(p, as_attachment=True, download_name=f"resume_{applicant_id}{p.suffix}",
+                     conditional=True, etag=True, max_age=3600)
 
 
 @APP.route('/jp/job/<int:job_id>/candidates')
@@ -433,22 +947,34 @@ def candidates(job_id: int):
     q = request.args.get('q','')
     skill = request.args.get('skill','')
     min_words = int(request.args.get('min_words','0') or '0')
+    sort = request.args.get('sort','score')
+    sq = request.args.get('sq','')
     con = db()
     job = con.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
-    rows = con.execute('SELECT * FROM applicants WHERE job_id=? ORDER BY score DESC', (job_id,)).fetchall()
-    filtered = []
-    for r in rows:
-        txt = (r['resume_text'] or '') + '\n' + ' '.join(json.loads(r['answers_json'] or '[]'))
-        words = len(txt.split())
-        if q and (q.lower() not in (r['name'] or '').lower() and q.lower() not in (r['email'] or '').lower() and q.lower() not in txt.lower()):
-            continue
-        if skill and skill.lower() not in txt.lower():
-            continue
-        if words < min_words:
-            continue
-        filtered.append(r)
+    if not job:
+        con.close()
+        return 'Not found', 404
+    rows = con.execute(f'SELECT {APPLICANT_COLS} FROM applicants WHERE job_id=? AND text_words>=? ORDER BY score DESC', (job_id, min_words)).fetchall()
+    match: Dict[int, float] = {}
+    if sort == 'semantic':
+        from . import vector_index
+        match = dict(vector_index.search(con, job_id, sq or job['description'] or job['title'] or ''))
+        rows = sorted(rows, key=lambda r: -match.get(r['id'], 0.0))
+    filtered = rows
+    if q or skill:
+        # text is only needed for keyword filters
+        texts = load_texts(con, [r['id'] for r in rows])
+        filtered = []
+        for r in rows:
+            txt = full_text(texts.get(r['id'], ''), r['answers_json']).lower()
+            if q and (q.lower() not in (r['name'] or '').lower() and q.lower() not in (r['email'] or '').lower() and q.lower() not in txt):
+                continue
+            if skill and skill.lower() not in txt:
+                continue
+            filtered.append(r)
     con.close()
-    return render_template_string(CANDIDATES_HTML, job=job, applicants=filtered, q=q, skill=skill, min_words=min_words)
+    return render('candidates', job=job, applicants=filtered, q=q, skill=skill, min_words=min_words,
+                  sort=sort, sq=sq, match=match)
 
 
 @APP.route('/jp/job/<int:job_id>/filters/propose')
@@ -456,8 +982,11 @@ def propose_filters(job_id: int):
     target = int(request.args.get('target','5') or '5')
     con = db()
     job = con.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
-    rows = con.execute('SELECT * FROM applicants WHERE job_id=?', (job_id,)).fetchall()
+    rows = con.execute(f'SELECT {APPLICANT_COLS} FROM applicants WHERE job_id=?', (job_id,)).fetchall()
+    texts = load_texts(con, [r['id'] for r in rows])
     con.close()
+    # lowered full text computed once per applicant, reused across filter passes
+    ltxt = {r['id']: full_text(texts.get(r['id'], ''), r['answers_json']).lower() for r in rows}
     # derive must-have keywords from job description top tokens
     desc = job['description'] or ''
     tokens = re.findall(r"[A-Za-z0-9+#\.]{3,}", desc.lower())
@@ -470,15 +999,13 @@ def propose_filters(job_id: int):
     def apply_filters(rows, must, min_words):
         out = []
         for r in rows:
-            txt = (r['resume_text'] or '') + '\n' + ' '.join(json.loads(r['answers_json'] or '[]'))
-            if all(m in txt.lower() for m in must) and len(txt.split()) >= min_words:
+            if all(m in ltxt[r['id']] for m in must) and (r['text_words'] or 0) >= min_words:
                 out.append({ 'id': r['id'], 'name': r['name'], 'email': r['email'], 'score': float(r['score'] or 0.0) })
         # if too few, relax to any keyword match
         if len(out) < target:
             out2 = []
             for r in rows:
-                txt = (r['resume_text'] or '') + '\n' + ' '.join(json.loads(r['answers_json'] or '[]'))
-                if any(m in txt.lower() for m in must) and len(txt.split()) >= min_words:
+                if any(m in ltxt[r['id']] for m in must) and (r['text_words'] or 0) >= min_words:
                     out2.append({ 'id': r['id'], 'name': r['name'], 'email': r['email'], 'score': float(r['score'] or 0.0) })
             out = out + [x for x in out2 if x not in out]
         # cap by score
@@ -512,7 +1039,8 @@ def gemini_filters(job_id: int):
         return jsonify({'ok': False, 'error': 'Gemini not configured'}), 200
     con = db()
     job = con.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
-    rows = con.execute('SELECT * FROM applicants WHERE job_id=?', (job_id,)).fetchall()
+    rows = con.execute(f'SELECT {APPLICANT_COLS} FROM applicants WHERE job_id=?', (job_id,)).fetchall()
+    sample_texts = load_texts(con, [r['id'] for r in rows[:20]])
     con.close()
     # Build compact corpus stats (<=500 tokens target)
     desc = (job['description'] or '')[:600]
@@ -524,8 +1052,8 @@ def gemini_filters(job_id: int):
     # Sample up to 20 applicants' key info without full text
     sample = []
     for r in rows[:20]:
-        txt = (r['resume_text'] or '')
-        words = len(txt.split())
+        txt = sample_texts.get(r['id'], '')
+        words = r['resume_words'] or 0
         # extract top hits from desc keywords present in resume
         hits = [k for k in top_desc if k in txt.lower()][:5]
         sample.append({'name': r['name'], 'email': r['email'], 'words': words, 'hits': hits, 'score': float(r['score'] or 0.0)})
@@ -533,7 +1061,7 @@ def gemini_filters(job_id: int):
         'job_title': job['title'],
         'desc_top_tokens': top_desc,
         'applicants_n': len(rows),
-        'avg_len': int(sum(len((r['resume_text'] or '').split()) for r in rows)/max(1,len(rows))),
+        'avg_len': int(sum((r['resume_words'] or 0) for r in rows)/max(1,len(rows))),
         'sample': sample
     }
     # Strict, short prompt
@@ -550,38 +1078,24 @@ def gemini_filters(job_id: int):
         f"Job/corpus stats (compact): {json.dumps(corpus, ensure_ascii=False)}\n"
         f"Target interviews: {target}\n"
     )
-    # Call Gemini
-    import requests
-    endpoint = os.getenv('GEMINI_ENDPOINT', 'https://generativelanguage.googleapis.com/v1beta/models')
-    model = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
-    api_key = os.getenv('GEMINI_API_KEY')
-    headers = {"x-goog-api-key": api_key, "Content-Type": "application/json"}
-    body = {'contents': [{'parts': [{'text': prompt}]}]}
     try:
-        r = requests.post(f"{endpoint}/{model}:generateContent", headers=headers, json=body, timeout=20)
-        r.raise_for_status()
-        resp = r.json()
-        text = resp.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-        data = None
-        try:
-            data = json.loads(text)
-        except Exception:
-            st = text.find('{'); en = text.rfind('}')
-            if st!=-1 and en!=-1 and en>st:
-                data = json.loads(text[st:en+1])
-        if not isinstance(data, dict):
-            return jsonify({'ok': False, 'error': 'Parse failure'}), 200
+        res = client.generate_json(prompt, schema=FILTERS_SCHEMA, timeout=20)
+        if not res['ok']:
+            return jsonify({'ok': False, 'error': res.get('error', 'Parse failure')}), 200
+        data = res['data']
         # Apply suggested filters locally for preview
         must = [s.strip().lower() for s in (data.get('must_keywords') or [])][:5]
         nice = [s.strip().lower() for s in (data.get('nice_keywords') or [])][:5]
         min_words = max(0, int(data.get('min_words') or 0))
         selected = []
+        con = db()
+        texts = load_texts(con, [r['id'] for r in rows if (r['text_words'] or 0) >= min_words])
+        con.close()
         for r in rows:
-            txt = (r['resume_text'] or '') + '\n' + ' '.join(json.loads(r['answers_json'] or '[]'))
-            ltxt = txt.lower()
-            if must and not all(k in ltxt for k in must):
+            if (r['text_words'] or 0) < min_words:
                 continue
-            if len(txt.split()) < min_words:
+            ltxt = full_text(texts.get(r['id'], ''), r['answers_json']).lower()
+            if must and not all(k in ltxt for k in must):
                 continue
             # soft bonus on nice keywords is for ordering only
             bonus = sum(1 for k in nice if k in ltxt) * 0.01
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+from . import app
+
+
+def iter_manifest(src: Path) -> Iterator[Dict[str, Any]]:
+    # A directory of resumes, or a CSV/JSONL manifest with name, email, resume, answers.
+    if src.is_dir():
+        for p in sorted(src.iterdir()):
+            if p.is_file() and p.suffix.lower() in app.ALLOWED_EXT:
+                yield {'name': p.stem, 'email': '', 'resume': str(p), 'answers': []}
+        return
+    base = src.parent
+    with src.open('r', encoding='utf-8', newline='') as f:
+        rows = csv.DictReader(f) if src.suffix.lower() == '.csv' else (json.loads(line) for line in f if line.strip())
+        for r in rows:
+            answers = r.get('answers') or []
+            if isinstance(answers, str):
+                answers = json.loads(answers) if answers.startswith('[') else [answers]
+            resume = r.get('resume') or ''
+            if resume and not Path(resume).is_absolute():
+                resume = str(base / resume)
+            yield {'name': r.get('name') or '', 'email': r.get('email') or '', 'resume': resume, 'answers': answers}
+
+
+def _parse_one(item: Dict[str, Any]) -> Dict[str, Any]:
+    # runs in a worker process: copy into sharded storage and extract text
+    out = dict(item)
+    out['resume_path'] = None
+    out['text'] = ''
+    out['error'] = None
+    src = Path(item['resume']) if item['resume'] else None
+    if src is None or not src.is_file():
+        out['error'] = 'resume not found'
+        return out
+    spool = app.UploadSpool(src.name)
+    try:
+        with src.open('rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                spool.write(chunk)
+        spool.seek(0)
+        dest = spool.commit()
+    except Exception as e:
+        spool.discard()
+        out['error'] = str(e)
+        return out
+    out['resume_path'] = dest.relative_to(app.UPLOADS).as_posix()
+    out['text'], _stats = app.extract_resume(dest)
+    return out
+
+
+def _insert_batch(con, job_id: int, matcher, batch: List[Dict[str, Any]]) -> int:
+    now = time.time()
+    con.execute('BEGIN IMMEDIATE')
+    try:
+        base = con.execute('SELECT COALESCE(MAX(id), 0) FROM applicants').fetchone()[0]
+        rows = []
+        texts = []
+        for i, it in enumerate(batch, start=1):
+            rw, tw = app.text_features(it['text'], it['answers'])
+            score = matcher.score(it['text'], it['answers'])
+            rows.append((base + i, job_id, it['name'], it['email'], json.dumps(it['answers']), it['resume_path'], float(score), now, rw, tw))
+            texts.append((base + i,) + app.encode_text(it['text']))
+        con.executemany('INSERT INTO applicants(id,job_id,name,email,answers_json,resume_path,score,created_at,resume_words,text_words) VALUES (?,?,?,?,?,?,?,?,?,?)', rows)
+        con.executemany('INSERT OR REPLACE INTO applicant_texts(applicant_id, codec, body) VALUES (?,?,?)', texts)
+    except BaseException:
+        # never leave the connection inside an open write transaction (it holds the DB write lock)
+        con.rollback()
+        raise
+    con.commit()
+    return len(rows)
+
+
+def parse_in_order(pool, items: Iterator[Dict[str, Any]], window: int) -> Iterator[Dict[str, Any]]:
+    # Like pool.map(_parse_one, items) in order, but with at most `window` items read from the manifest and
+    # in flight, so parsed texts cannot pile up ahead of the inserter on a 100k-row import.
+    pending: deque = deque()
+    for item in items:
+        pending.append(pool.submit(_parse_one, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def import_applicants(job_id: int, src: Path, workers: Optional[int] = None, batch_size: int = 1000, log=print) -> Dict[str, Any]:
+    app.init_db()
+    con = app.db()
+    con.isolation_level = None  # explicit BEGIN/COMMIT per batch
+    job = con.execute('SELECT id, description FROM jobs WHERE id=?', (job_id,)).fetchone()
+    if not job:
+        con.close()
+        raise SystemExit(f'job {job_id} not found')
+    matcher = app.job_matcher(job_id, job['description'] or '')
+    inserted = failed = 0
+    t0 = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for res in parse_in_order(pool, iter_manifest(src), window=4 * workers):
+            if res['error']:
+                failed += 1
+                log(f"[import] skip {res['resume'] or res['name']}: {res['error']}")
+                continue
+            batch.append(res)
+            if len(batch) >= batch_size:
+                inserted += _insert_batch(con, job_id, matcher, batch)
+                batch = []
+                log(f"[import] {inserted} rows ({inserted / (time.perf_counter() - t0):.0f} rows/s)")
+    if batch:
+        inserted += _insert_batch(con, job_id, matcher, batch)
+    con.close()
+    elapsed = time.perf_counter() - t0
+    return {'inserted': inserted, 'failed': failed, 'elapsed_sec': elapsed,
+            'rows_per_sec': (inserted / elapsed) if elapsed > 0 else 0.0}
+
+
+EXPORT_FIELDS = ['id', 'job_id', 'name', 'email', 'score', 'resume_words', 'text_words', 'resume_path', 'created_at', 'answers']
+
+
+def export_applicants(job_id: int, out, fmt: str = 'jsonl', with_text: bool = False, chunk: int = 500) -> int:
+    # streams rows chunk by chunk; texts are fetched per chunk only when requested
+    con = app.db()
+    fields = EXPORT_FIELDS + (['resume_text'] if with_text else [])
+    writer = csv.DictWriter(out, fieldnames=fields) if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+    cur = con.execute(f'SELECT {app.APPLICANT_COLS} FROM applicants WHERE job_id=? ORDER BY id', (job_id,))
+    n = 0
+    while True:
+        rows = cur.fetchmany(chunk)
+        if not rows:
+            break
+        texts = app.load_texts(con, [r['id'] for r in rows]) if with_text else {}
+        for r in rows:
+            rec = {k: r[k] for k in EXPORT_FIELDS if k != 'answers'}
+            rec['answers'] = json.loads(r['answers_json'] or '[]')
+            if with_text:
+                rec['resume_text'] = texts.get(r['id'], '')
+            if writer:
+                rec['answers'] = json.dumps(rec['answers'], ensure_ascii=False)
+                writer.writerow(rec)
+            else:
+                out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            n += 1
+    con.close()
+    return n
+
+
+def open_output(path: Optional[str]):
+    if not path or path == '-':
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8', newline='')
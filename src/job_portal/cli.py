@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from .app import APP, db, init_db, migrate_uploads, rescore_job
+
+
+def cmd_serve(args):
+    init_db()
+    APP.run(host=args.host, port=args.port, debug=False)
+
+
+def cmd_rescore(args):
+    init_db()
+    con = db()
+    job_ids = args.job or [r['id'] for r in con.execute('SELECT id FROM jobs ORDER BY id').fetchall()]
+    total = 0
+    t0 = time.perf_counter()
+    for job_id in job_ids:
+        n = rescore_job(con, job_id)
+        total += n
+        print(f"[rescore] job={job_id} applicants={n}")
+    con.close()
+    elapsed = time.perf_counter() - t0
+    rate = (total / elapsed) if elapsed > 0 else 0.0
+    print(f"[rescore] {total} applicants in {elapsed:.2f}s ({rate:.0f} rows/s)")
+
+
+def cmd_migrate_uploads(args):
+    init_db()
+    con = db()
+    moved = migrate_uploads(con)
+    con.close()
+    print(f"[migrate-uploads] moved {moved} files into sharded storage")
+
+
+def cmd_import(args):
+    from .bulk import import_applicants
+    res = import_applicants(args.job, Path(args.src), workers=args.workers, batch_size=args.batch)
+    print(f"[import] {res['inserted']} applicants ({res['failed']} failed) in {res['elapsed_sec']:.2f}s ({res['rows_per_sec']:.0f} rows/s)")
+
+
+def cmd_export(args):
+    from .bulk import export_applicants, open_output
+    init_db()
+    t0 = time.perf_counter()
+    out = open_output(args.output)
+    try:
+        n = export_applicants(args.job, out, fmt=args.format, with_text=args.with_text)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    rate = (n / elapsed) if elapsed > 0 else 0.0
+    print(f"[export] {n} applicants in {elapsed:.2f}s ({rate:.0f} rows/s)", file=sys.stderr)
+
+
+def cmd_reindex(args):
+    from . import vector_index
+    init_db()
+    con = db()
+    job_ids = args.job or [r['id'] for r in con.execute('SELECT id FROM jobs ORDER BY id').fetchall()]
+    for job_id in job_ids:
+        t0 = time.perf_counter()
+        idx = vector_index.rebuild(con, job_id)
+        print(f"[reindex] job={job_id} {idx.kind} docs={len(idx.ids)} in {time.perf_counter() - t0:.2f}s")
+    con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='job_portal', description='Job Portal (local)')
+    sub = parser.add_subparsers(dest='cmd')
+    p = sub.add_parser('serve', help='Run the web app (default)')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=int(os.getenv('JOB_PORTAL_PORT', '8770')))
+    p.set_defaults(func=cmd_serve)
+    p = sub.add_parser('rescore', help='Recompute basic_score for all applicants of a job')
+    p.add_argument('--job', type=int, action='append', help='Job id (repeatable); default all jobs')
+    p.set_defaults(func=cmd_rescore)
+    p = sub.add_parser('migrate-uploads', help='Move resumes into hash-sharded storage')
+    p.set_defaults(func=cmd_migrate_uploads)
+    p = sub.add_parser('import', help='Bulk import resumes from a directory or CSV/JSONL manifest')
+    p.add_argument('--job', type=int, required=True)
+    p.add_argument('src', help='Directory of resumes, or manifest (.csv/.jsonl) with name,email,resume,answers')
+    p.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    p.add_argument('--batch', type=int, default=1000, help='Rows per insert transaction')
+    p.set_defaults(func=cmd_import)
+    p = sub.add_parser('export', help='Stream applicants of a job to JSONL/CSV')
+    p.add_argument('--job', type=int, required=True)
+    p.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    p.add_argument('--with-text', action='store_true', help='Include parsed resume text')
+    p.add_argument('-o', '--output', default='-', help='Output file (default stdout)')
+    p.set_defaults(func=cmd_export)
+    p = sub.add_parser('reindex', help='Rebuild the semantic (TF-IDF/embedding) index')
+    p.add_argument('--job', type=int, action='append', help='Job id (repeatable); default all jobs')
+    p.set_defaults(func=cmd_reindex)
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in sub.choices and argv[0] not in ('-h', '--help'):
+        # no subcommand: serve, so `python -m job_portal --port 9999` works
+        argv = ['serve'] + argv
+    args = parser.parse_args(argv)
+    args.func(args)
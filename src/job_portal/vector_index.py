@@ -0,0 +1,262 @@
+import heapq
+import importlib
+import json
+import math
+import os
+import pickle
+import tempfile
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+from . import app
+
+STOPWORDS = frozenset('the and for with you are this that from have has was were will our your not but all can'
+                      ' its into per use using via etc'.split())
+# query pruning: the heaviest terms carry the ranking; very common terms add work but little signal
+MAX_QUERY_TERMS = 32
+MAX_DF_RATIO = 0.6
+COMPACT_EVERY = 1000
+
+
+def tokenize(text: str) -> List[str]:
+    toks = (text or '').lower().translate(app._SEP_TABLE).split()
+    out = []
+    for t in toks:
+        t = t.rstrip('.')
+        if len(t) >= 2 and t not in STOPWORDS:
+            out.append(t)
+    return out
+
+
+class TfidfIndex:
+    # Sparse TF-IDF (SMART lnc.ltc): documents keep cosine-normalised log-tf weights and idf is
+    # applied to the query only, so adding a document never rewrites existing postings.
+    kind = 'tfidf'
+
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.ids = set()
+        self.max_id = 0
+
+    def encode(self, text: str) -> Dict[str, int]:
+        return dict(Counter(tokenize(text)))
+
+    def add_encoded(self, doc_id: int, tf: Dict[str, int]):
+        if doc_id in self.ids:
+            return
+        self.ids.add(doc_id)
+        self.max_id = max(self.max_id, doc_id)
+        weights = {t: 1.0 + math.log(c) for t, c in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        for t, w in weights.items():
+            p = self.postings.get(t)
+            if p is None:
+                p = self.postings[t] = (array('i'), array('f'))
+            p[0].append(doc_id)
+            p[1].append(w / norm)
+
+    def add(self, doc_id: int, text: str):
+        self.add_encoded(doc_id, self.encode(text))
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        n = len(self.ids)
+        if not n:
+            return []
+        q = []
+        for t, c in Counter(tokenize(query)).items():
+            p = self.postings.get(t)
+            if p is None or len(p[0]) > MAX_DF_RATIO * n and n > 10:
+                continue
+            idf = math.log((n + 1) / (len(p[0]) + 1)) + 1.0
+            q.append(((1.0 + math.log(c)) * idf, t))
+        q = heapq.nlargest(MAX_QUERY_TERMS, q)
+        qnorm = math.sqrt(sum(w * w for w, _ in q)) or 1.0
+        acc: Dict[int, float] = {}
+        get = acc.get
+        for w, t in q:
+            qw = w / qnorm
+            ids, ws = self.postings[t]
+            for d, dw in zip(ids, ws):
+                acc[d] = get(d, 0.0) + qw * dw
+        return heapq.nlargest(k, acc.items(), key=lambda kv: kv[1])
+
+
+class EmbeddingIndex:
+    # Dense vectors from a pluggable local model; brute-force cosine over normalised vectors.
+    kind = 'embedding'
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.vectors: Dict[int, array] = {}
+        self.ids = self.vectors.keys()
+        self.max_id = 0
+
+    def encode(self, text: str) -> List[float]:
+        v = list(self.embedder([text])[0])
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+    def add_encoded(self, doc_id: int, vec: List[float]):
+        self.vectors[doc_id] = array('f', vec)
+        self.max_id = max(self.max_id, doc_id)
+
+    def add(self, doc_id: int, text: str):
+        self.add_encoded(doc_id, self.encode(text))
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        q = self.encode(query)
+        scored = ((d, sum(a * b for a, b in zip(q, v))) for d, v in self.vectors.items())
+        return heapq.nlargest(k, scored, key=lambda kv: kv[1])
+
+    def __getstate__(self):
+        return {'vectors': self.vectors, 'max_id': self.max_id}
+
+    def __setstate__(self, state):
+        self.embedder = load_embedder()
+        self.vectors = state['vectors']
+        self.ids = self.vectors.keys()
+        self.max_id = state['max_id']
+
+
+_EMBEDDER: Dict[str, Any] = {}
+
+
+def load_embedder():
+    # JOB_PORTAL_EMBEDDER="package.module:factory"; factory() returns a callable texts -> vectors.
+    # The model is loaded once per process.
+    spec = os.getenv('JOB_PORTAL_EMBEDDER', '')
+    if not spec:
+        return None
+    if spec not in _EMBEDDER:
+        mod, _, attr = spec.partition(':')
+        _EMBEDDER[spec] = getattr(importlib.import_module(mod), attr or 'load')()
+    return _EMBEDDER[spec]
+
+
+def new_index():
+    embedder = load_embedder()
+    return EmbeddingIndex(embedder) if embedder is not None else TfidfIndex()
+
+
+def _paths(job_id: int, kind: str):
+    base = app.DATA_DIR / 'index'
+    return base / f'job_{job_id}.{kind}.pkl', base / f'job_{job_id}.{kind}.log'
+
+
+_INDEXES: Dict[int, Any] = {}
+# One re-entrant lock per job: the threaded server may load, sync, add to, pickle or search the same index
+# from several requests; pickling while another request adds a document fails mid-iteration.
+_LOCKS: Dict[int, threading.RLock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def job_lock(job_id: int) -> threading.RLock:
+    with _LOCKS_GUARD:
+        lock = _LOCKS.get(job_id)
+        if lock is None:
+            lock = _LOCKS[job_id] = threading.RLock()
+        return lock
+
+
+def save(job_id: int, idx):
+    snap, log = _paths(job_id, idx.kind)
+    snap.parent.mkdir(parents=True, exist_ok=True)
+    with job_lock(job_id):
+        # a temp file per writer: another process (CLI reindex, a second server) may be saving the same job
+        tmp = tempfile.NamedTemporaryFile('wb', dir=snap.parent, prefix=snap.name + '.', suffix='.tmp', delete=False)
+        try:
+            with tmp:
+                pickle.dump(idx, tmp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp.name, snap)
+        except BaseException:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+            raise
+        log.unlink(missing_ok=True)
+        idx.log_lines = 0
+
+
+def load(job_id: int):
+    idx = new_index()
+    snap, log = _paths(job_id, idx.kind)
+    if snap.exists():
+        with snap.open('rb') as f:
+            idx = pickle.load(f)
+    idx.log_lines = 0
+    if log.exists():
+        # replay documents appended since the last snapshot
+        with log.open('r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    idx.add_encoded(rec['id'], rec['enc'])
+                    idx.log_lines += 1
+    return idx
+
+
+def add_applicant(job_id: int, applicant_id: int, text: str):
+    # incremental add on apply: update the in-memory index and append to the on-disk log
+    with job_lock(job_id):
+        _add_applicant(job_id, applicant_id, text)
+
+
+def _add_applicant(job_id: int, applicant_id: int, text: str):
+    idx = _INDEXES.get(job_id)
+    enc_idx = idx if idx is not None else new_index()
+    enc = enc_idx.encode(text)
+    if idx is not None:
+        idx.add_encoded(applicant_id, enc)
+    _snap, log = _paths(job_id, enc_idx.kind)
+    log.parent.mkdir(parents=True, exist_ok=True)
+    with log.open('a', encoding='utf-8') as f:
+        f.write(json.dumps({'id': applicant_id, 'enc': enc}) + '\n')
+    if idx is not None:
+        idx.log_lines += 1
+        if idx.log_lines >= COMPACT_EVERY:
+            save(job_id, idx)
+
+
+def sync(con, job_id: int, idx) -> int:
+    # picks up applicants added outside this process (bulk import, other workers)
+    cnt, max_id = con.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM applicants WHERE job_id=?', (job_id,)).fetchone()
+    if cnt == len(idx.ids) and max_id == idx.max_id:
+        return 0
+    ids = [r[0] for r in con.execute('SELECT id FROM applicants WHERE job_id=?', (job_id,)).fetchall()]
+    missing = [i for i in ids if i not in idx.ids]
+    for i in range(0, len(missing), 500):
+        part = missing[i:i+500]
+        texts = app.load_texts(con, part)
+        for r in con.execute(f"SELECT id, answers_json FROM applicants WHERE id IN ({','.join('?' * len(part))})", part).fetchall():
+            idx.add(r['id'], app.full_text(texts.get(r['id'], ''), r['answers_json']))
+    if missing:
+        save(job_id, idx)
+    return len(missing)
+
+
+def get_index(con, job_id: int):
+    with job_lock(job_id):
+        idx = _INDEXES.get(job_id)
+        if idx is None:
+            idx = _INDEXES[job_id] = load(job_id)
+        sync(con, job_id, idx)
+        return idx
+
+
+def search(con, job_id: int, query: str, k: int = None) -> List[Tuple[int, float]]:
+    # k=None ranks every document of the job, so a caller that filters rows afterwards still gets each
+    # remaining row's score instead of losing top-k places to rows it dropped
+    with job_lock(job_id):
+        idx = get_index(con, job_id)
+        return idx.search(query, k=len(idx.ids) if k is None else k)
+
+
+def rebuild(con, job_id: int):
+    with job_lock(job_id):
+        idx = new_index()
+        idx.log_lines = 0
+        _INDEXES[job_id] = idx
+        sync(con, job_id, idx)
+        save(job_id, idx)
+        return idx
@@ -3,12 +3,81 @@ import os
 import threading
 import time
 from pathlib import Path
-from typing import Iterable, Dict, Any
+from typing import Iterable, Dict, Any, Callable, List, Optional
+
+
+def titles_path(out_dir: Path, date: str) -> Path:
+    return out_dir / f'titles-{date}.jsonl'
+
+
+def load_titles(out_dir: Path, date: str) -> Dict[int, str]:
+    # title_id -> title for one day's metrics file; empty for days written before titles were interned
+    out: Dict[int, str] = {}
+    fpath = titles_path(out_dir, date)
+    if not fpath.exists():
+        return out
+    with fpath.open('r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                out[int(rec['id'])] = rec['title']
+            except Exception:
+                continue
+    return out
+
+
+def session_title(s: Dict[str, Any], titles: Dict[int, str]) -> str:
+    if 'title_id' in s:
+        return titles.get(s['title_id'], '')
+    return str(s.get('title') or '')
+
+
+class TitleDictionary:
+    # Per-day string table: each distinct title is written once to titles-YYYYMMDD.jsonl ({id, title}) and
+    # metrics rows carry only title_id. Ids restart every day so a day's files stand on their own.
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self.date = None
+        self.ids: Dict[str, int] = {}
+        self.next_id = 1
+
+    def encode(self, date: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if date != self.date:
+            self.date = date
+            known = load_titles(self.out_dir, date)
+            self.ids = {t: i for i, t in known.items()}
+            self.next_id = max(known, default=0) + 1
+        new = []
+        out = []
+        for item in rows:
+            if 'title' not in item:
+                out.append(item)
+                continue
+            item = dict(item)
+            title = str(item.pop('title') or '')
+            tid = self.ids.get(title)
+            if tid is None:
+                tid = self.ids[title] = self.next_id
+                self.next_id += 1
+                new.append({'id': tid, 'title': title})
+            item['title_id'] = tid
+            out.append(item)
+        if new:
+            # dictionary entries land before the rows that use them
+            with titles_path(self.out_dir, date).open('a', encoding='utf-8') as f:
+                for rec in new:
+                    f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+        return out
 
 
 class Aggregator:
-    def __init__(self, out_dir: Path, flush_interval_sec: int = 60):
+    def __init__(self, out_dir: Path, flush_interval_sec: int = 60,
+                 sinks: Optional[List[Callable[[List[Dict[str, Any]]], None]]] = None, intern_titles: bool = True):
         self.out_dir = out_dir
+        self.titles = TitleDictionary(out_dir) if intern_titles else None
+        # called with each flushed batch after it is on disk (e.g. the fleet collector push); sinks get the rows
+        # with their titles, since title ids only mean something next to this device's titles-<day>.jsonl
+        self.sinks = list(sinks or [])
         self.out_dir.mkdir(parents=True, exist_ok=True)
         self.flush_interval_sec = flush_interval_sec
         self._queue = []
@@ -20,6 +89,10 @@ class Aggregator:
         with self._lock:
             self._queue.extend(sessions)
 
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
     def stop(self):
         self._stop.set()
         time.sleep(0.1)
@@ -36,7 +109,13 @@ class Aggregator:
                 return
             data, self._queue = self._queue, []
         date = time.strftime('%Y%m%d')
+        rows = self.titles.encode(date, data) if self.titles is not None else data
         fpath = self.out_dir / f'metrics-{date}.jsonl'
         with fpath.open('a', encoding='utf-8') as f:
-            for item in data:
+            for item in rows:
                 f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        for sink in self.sinks:
+            try:
+                sink(data)
+            except Exception as e:
+                print(f"[warn] flush sink failed: {e}")
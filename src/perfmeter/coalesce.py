@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Optional
+
+# Folds sub-threshold sessions (alt-tab flicker, a 0.5 s explorer.exe) into a neighbour before they reach the
+# Aggregator. A short session is absorbed by the contiguous session before it or, when it opens a run, by the
+# one after it; when the window on both sides of a flicker is the same, the two halves are joined as well.
+# Durations, input counts and activity buckets are summed, so totals are unchanged. The host row records
+# `coalesced` (rows folded into it = switches no longer counted by app_switches) and `coalesced_sec`
+# (time that came from sub-threshold sessions).
+COUNT_FIELDS = ('words_typed', 'backspaces', 'keys_pressed', 'mouse_distance')
+ACTIVITY_FIELDS = ('keys', 'words', 'backspaces', 'mouse')
+
+
+def merge_activity(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # buckets are aligned to wall-clock multiples of sec, so two sessions' lists line up by t0 offset
+    if a is None or b is None or a.get('sec') != b.get('sec'):
+        return a if a is not None else b
+    sec = a['sec']
+    t0 = min(a['t0'], b['t0'])
+    offs = [int(round((x['t0'] - t0) / sec)) for x in (a, b)]
+    n = max(off + len(x['keys']) for off, x in zip(offs, (a, b)))
+    out: Dict[str, Any] = {'t0': t0, 'sec': sec}
+    for f in ACTIVITY_FIELDS:
+        vals = [0] * n
+        for off, x in zip(offs, (a, b)):
+            for i, v in enumerate(x.get(f) or ()):
+                vals[off + i] += v
+        out[f] = [round(v, 1) for v in vals] if f == 'mouse' else vals
+    out['idle'] = [0 if (k or m) else 1 for k, m in zip(out['keys'], out['mouse'])]
+    return out
+
+
+def absorb(host: Dict[str, Any], s: Dict[str, Any], short_sec: float):
+    # fold s (before or after host in time) into host; host keeps its exe/title/category
+    if 'active_sec' in host or 'active_sec' in s:
+        host['active_sec'] = host.get('active_sec', host['duration_sec']) + s.get('active_sec', s['duration_sec'])
+    host['duration_sec'] += s['duration_sec']
+    for f in COUNT_FIELDS:
+        host[f] = host.get(f, 0) + s.get(f, 0)
+    if s['start_ts'] < host['start_ts']:
+        host['start_ts'] = s['start_ts']
+    else:
+        host['end_ts'] = s['end_ts']
+        if 'end_reason' in s:
+            host['end_reason'] = s['end_reason']
+    if 'activity' in host or 'activity' in s:
+        host['activity'] = merge_activity(host.get('activity'), s.get('activity'))
+    host['coalesced'] = host.get('coalesced', 0) + 1 + s.get('coalesced', 0)
+    host['coalesced_sec'] = host.get('coalesced_sec', 0.0) + short_sec
+
+
+class Coalescer:
+    # Stateful across tracker flushes: the newest session is held back until the next feed() (or drain()),
+    # because the session that should absorb it, or that it should absorb, may arrive in the next batch.
+    def __init__(self, min_sec: float = 1.0, max_gap_sec: float = 0.05):
+        self.min_sec = min_sec
+        self.max_gap_sec = max_gap_sec
+        self._tail: Optional[Dict[str, Any]] = None
+        self._flicker = False  # the tail just absorbed a short session; returning to the same window joins it
+
+    def feed(self, sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        tail, flicker = self._tail, self._flicker
+        for s in sessions:
+            if tail is not None and 0 <= s['start_ts'] - tail['end_ts'] <= self.max_gap_sec:
+                if s['duration_sec'] < self.min_sec:
+                    absorb(tail, s, s['duration_sec'])
+                    flicker = True
+                    continue
+                if flicker and s['exe'] == tail['exe'] and s.get('title') == tail.get('title'):
+                    absorb(tail, s, 0.0)
+                    flicker = False
+                    continue
+                if tail['duration_sec'] < self.min_sec:
+                    # a short session (plus anything it absorbed) that opened the run folds forward
+                    absorb(s, tail, tail['duration_sec'])
+                    tail, flicker = s, False
+                    continue
+            if tail is not None:
+                out.append(tail)
+            tail, flicker = s, False
+        self._tail, self._flicker = tail, flicker
+        return out
+
+    def drain(self) -> List[Dict[str, Any]]:
+        tail, self._tail, self._flicker = self._tail, None, False
+        return [tail] if tail is not None else []
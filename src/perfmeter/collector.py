@@ -0,0 +1,263 @@
+import argparse
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+from . import instrument
+
+APP = Flask(__name__)
+ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = Path(os.getenv('COLLECTOR_DATA_DIR', ROOT / 'data' / 'collector'))
+TOKEN = os.getenv('COLLECTOR_TOKEN', '')
+MAX_BODY = int(os.getenv('COLLECTOR_MAX_BODY', str(16 * 1024 * 1024)))
+APP.config['MAX_CONTENT_LENGTH'] = MAX_BODY
+instrument.install_flask(APP, 'collector')
+
+# summed per (day, team, role); sessions arrive with the same field names the agent writes
+ROLLUP_FIELDS = (
+    ('duration_sec', 'time_sec'),
+    ('active_sec', 'active_sec'),
+    ('words_typed', 'words'),
+    ('keys_pressed', 'keys'),
+    ('backspaces', 'backspaces'),
+    ('mouse_distance', 'mouse'),
+)
+
+_local = threading.local()
+_DEVICE_LOCKS: Dict[str, threading.Lock] = {}
+_DEVICE_LOCKS_GUARD = threading.Lock()
+
+
+def db() -> sqlite3.Connection:
+    # one connection per server thread; WAL so rollup reads do not block ingest
+    con = getattr(_local, 'con', None)
+    if con is None or getattr(_local, 'path', None) != DATA_DIR:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(DATA_DIR / 'collector.db', timeout=30, isolation_level=None,
+                              factory=instrument.connection_factory())
+        con.row_factory = sqlite3.Row
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        _local.con, _local.path = con, DATA_DIR
+    return con
+
+
+def init_db():
+    con = db()
+    con.execute('''CREATE TABLE IF NOT EXISTS devices (
+        device TEXT PRIMARY KEY,
+        team TEXT,
+        role TEXT,
+        last_seq INTEGER NOT NULL DEFAULT 0,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        last_seen REAL
+    )''')
+    cols = ', '.join(f'{c} REAL NOT NULL DEFAULT 0' for _, c in ROLLUP_FIELDS)
+    con.execute(f'''CREATE TABLE IF NOT EXISTS rollups (
+        day TEXT NOT NULL,
+        team TEXT NOT NULL,
+        role TEXT NOT NULL,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        {cols},
+        PRIMARY KEY (day, team, role)
+    )''')
+    con.execute('''CREATE TABLE IF NOT EXISTS device_days (
+        day TEXT NOT NULL,
+        team TEXT NOT NULL,
+        role TEXT NOT NULL,
+        device TEXT NOT NULL,
+        PRIMARY KEY (day, team, role, device)
+    )''')
+
+
+def device_lock(device: str) -> threading.Lock:
+    lock = _DEVICE_LOCKS.get(device)
+    if lock is None:
+        with _DEVICE_LOCKS_GUARD:
+            lock = _DEVICE_LOCKS.setdefault(device, threading.Lock())
+    return lock
+
+
+def shard_path(device: str, day: str) -> Path:
+    return DATA_DIR / 'devices' / device / f'{day}.jsonl'
+
+
+def batch_offset(b: Dict[str, Any]) -> int:
+    # the agent's UTC offset (seconds east) when it flushed the batch; 0 (UTC days) for agents that do not send one
+    try:
+        off = int(b.get('utc_offset') or 0)
+    except (TypeError, ValueError):
+        return 0
+    return off if -14 * 3600 <= off <= 14 * 3600 else 0
+
+
+def session_day(s: Dict[str, Any], offset: int = 0) -> str:
+    # the device's local date of start_ts, the same day the agent, dashboard and /api/query file it under
+    ts = s.get('start_ts') or 0
+    return time.strftime('%Y%m%d', time.gmtime(float(ts) + offset))
+
+
+def safe_name(value: str) -> str:
+    keep = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in (value or '').strip())
+    return keep.strip('.')[:64]
+
+
+def ingest(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # payload: {device, team, role, batches: [{seq, sessions: [...]}]}; batches at or below the
+    # device's acknowledged seq are replays and skipped, so agents can retry freely.
+    device = safe_name(str(payload.get('device') or ''))
+    if not device:
+        raise ValueError('device required')
+    team = str(payload.get('team') or '')[:64]
+    role = str(payload.get('role') or '')[:64]
+    batches = payload.get('batches') or []
+    with device_lock(device):
+        con = db()
+        row = con.execute('SELECT last_seq FROM devices WHERE device=?', (device,)).fetchone()
+        acked = row['last_seq'] if row else 0
+        fresh = sorted((b for b in batches if int(b.get('seq', 0)) > acked), key=lambda b: int(b['seq']))
+        if not fresh:
+            return {'ok': True, 'acked': acked, 'sessions': 0, 'skipped': len(batches)}
+        by_day: Dict[str, List[str]] = {}
+        rollup: Dict[str, List[float]] = {}
+        n = 0
+        for b in fresh:
+            offset = batch_offset(b)
+            for s in b.get('sessions') or []:
+                if not isinstance(s, dict):
+                    continue
+                day = session_day(s, offset)
+                by_day.setdefault(day, []).append(json.dumps(s, ensure_ascii=False, separators=(',', ':')))
+                acc = rollup.setdefault(day, [0.0] * (len(ROLLUP_FIELDS) + 1))
+                acc[0] += 1
+                for i, (src, _) in enumerate(ROLLUP_FIELDS, start=1):
+                    val = s.get(src)
+                    if val is None and src == 'active_sec':
+                        val = s.get('duration_sec')  # agents before activity buckets
+                    try:
+                        acc[i] += float(val or 0.0)
+                    except (TypeError, ValueError):
+                        pass
+                n += 1
+        # raw shards first, then the cursor: a crash in between re-ingests (at-least-once), never loses
+        for day, lines in by_day.items():
+            path = shard_path(device, day)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open('a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        new_seq = int(fresh[-1]['seq'])
+        cols = [c for _, c in ROLLUP_FIELDS]
+        upsert = (
+            f"INSERT INTO rollups(day, team, role, sessions, {', '.join(cols)}) VALUES (?,?,?,?{',?' * len(cols)}) "
+            f"ON CONFLICT(day, team, role) DO UPDATE SET sessions=sessions+excluded.sessions, "
+            + ', '.join(f'{c}={c}+excluded.{c}' for c in cols)
+        )
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            con.executemany(upsert, [(day, team, role, int(acc[0]), *acc[1:]) for day, acc in rollup.items()])
+            con.executemany('INSERT OR IGNORE INTO device_days(day, team, role, device) VALUES (?,?,?,?)',
+                            [(day, team, role, device) for day in rollup])
+            con.execute(
+                'INSERT INTO devices(device, team, role, last_seq, sessions, last_seen) VALUES (?,?,?,?,?,?) '
+                'ON CONFLICT(device) DO UPDATE SET team=excluded.team, role=excluded.role, last_seq=excluded.last_seq, '
+                'sessions=sessions+excluded.sessions, last_seen=excluded.last_seen',
+                (device, team, role, new_seq, n, time.time()),
+            )
+            con.execute('COMMIT')
+        except Exception:
+            con.execute('ROLLBACK')
+            raise
+    return {'ok': True, 'acked': new_seq, 'sessions': n, 'skipped': len(batches) - len(fresh)}
+
+
+def read_payload() -> Dict[str, Any]:
+    raw = request.get_data(cache=False)
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        # multi-member gzip is fine: spooling agents concatenate pre-compressed batches
+        d = gzip.GzipFile(fileobj=io.BytesIO(raw))
+        raw = d.read(MAX_BODY + 1)
+        if len(raw) > MAX_BODY:
+            raise ValueError('payload too large')
+    if request.mimetype == 'application/x-ndjson':
+        # first line {device, team, role}, then one {seq, sessions} batch per line
+        lines = [line for line in raw.splitlines() if line.strip()]
+        if not lines:
+            raise ValueError('empty payload')
+        payload = json.loads(lines[0])
+        if isinstance(payload, dict):
+            payload['batches'] = [json.loads(line) for line in lines[1:]]
+        return payload
+    return json.loads(raw)
+
+
+@APP.post('/ingest')
+def api_ingest():
+    if TOKEN and request.headers.get('Authorization') != f'Bearer {TOKEN}':
+        return jsonify({'ok': False, 'error': 'unauthorized'}), 401
+    try:
+        payload = read_payload()
+        if not isinstance(payload, dict):
+            raise ValueError('expected object')
+        return jsonify(ingest(payload))
+    except (ValueError, OSError) as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+
+
+@APP.get('/rollups')
+def api_rollups():
+    # ?day=YYYYMMDD (or from/to) &team= &role=
+    where, args = [], []
+    day = request.args.get('day')
+    if day:
+        where.append('r.day=?')
+        args.append(day)
+    if request.args.get('from'):
+        where.append('r.day>=?')
+        args.append(request.args['from'])
+    if request.args.get('to'):
+        where.append('r.day<=?')
+        args.append(request.args['to'])
+    for k in ('team', 'role'):
+        if request.args.get(k) is not None:
+            where.append(f'r.{k}=?')
+            args.append(request.args[k])
+    sql = ('SELECT r.*, (SELECT COUNT(*) FROM device_days d WHERE d.day=r.day AND d.team=r.team AND d.role=r.role) AS devices '
+           'FROM rollups r' + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY r.day, r.team, r.role')
+    return jsonify({'rows': [dict(r) for r in db().execute(sql, args).fetchall()]})
+
+
+@APP.get('/devices')
+def api_devices():
+    rows = db().execute('SELECT device, team, role, last_seq, sessions, last_seen FROM devices ORDER BY device').fetchall()
+    return jsonify({'devices': [dict(r) for r in rows]})
+
+
+def serve(host: str = '127.0.0.1', port: int = 8780):
+    init_db()
+    server = make_server(host, port, APP, threaded=True)
+    print(f'[collector] listening on http://{host}:{port} data={DATA_DIR}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Performance Meter fleet collector')
+    parser.add_argument('--host', default=os.getenv('COLLECTOR_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('COLLECTOR_PORT', '8780')))
+    args = parser.parse_args()
+    serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,24 @@
+import bisect
 import json
 import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 
 from flask import Flask, jsonify, render_template_string, request
 from werkzeug.serving import make_server
 import threading
 import time
 
+from . import instrument, logload
 from .gemini_client import GeminiClient
+from .llm_response import STRESS_SCHEMA
+from .downsample import PX_PER_BAR, lttb, point_budget, top_n
+from .query import QueryError, run_query
 
 APP = Flask(__name__)
 ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = Path(os.getenv('PERFMETER_DATA_DIR', ROOT / 'data'))
+instrument.install_flask(APP, 'dashboard')
 
 INDEX_HTML = """
 <!doctype html>
@@ -32,6 +38,7 @@ INDEX_HTML = """
       <div class="bg-white shadow rounded p-4">
         <div class="text-sm text-slate-500">Total Time</div>
         <div id="total_time" class="text-2xl font-semibold">--</div>
+        <div id="focus_time" class="text-xs text-slate-500"></div>
       </div>
       <div class="bg-white shadow rounded p-4">
         <div class="text-sm text-slate-500">WPM</div>
@@ -96,6 +103,22 @@ INDEX_HTML = """
       </div>
     </div>
 
+    <div class="bg-white shadow rounded p-4 mb-6">
+      <div class="flex items-center justify-between mb-2">
+        <h2 class="font-semibold">Activity Timeline</h2>
+        <div class="flex items-center gap-3">
+          <div class="text-xs text-slate-500" id="timeline_meta"></div>
+          <select id="timeline_days" class="text-sm border rounded px-1">
+            <option value="1">Today</option>
+            <option value="30">30 days</option>
+            <option value="90">90 days</option>
+            <option value="365">365 days</option>
+          </select>
+        </div>
+      </div>
+      <canvas id="timeline_chart" height="80"></canvas>
+    </div>
+
     <div class="bg-white shadow rounded p-4 mb-6">
       <div class="flex items-center justify-between mb-2">
         <h2 class="font-semibold">Stress Analysis (last <span id="stress_days">7</span> days)</h2>
@@ -123,6 +146,37 @@ INDEX_HTML = """
       <pre id="stress_notes" class="text-xs bg-slate-50 p-2 rounded overflow-auto max-h-40 mt-3">--</pre>
     </div>
 
+    <div class="bg-white shadow rounded p-4 mb-6">
+      <div class="flex items-center justify-between mb-2">
+        <h2 class="font-semibold">Agent Footprint</h2>
+        <div class="text-xs text-slate-500" id="agent_meta"></div>
+      </div>
+      <div class="grid grid-cols-2 md:grid-cols-5 gap-4">
+        <div>
+          <div class="text-sm text-slate-500">CPU (%)</div>
+          <div id="agent_cpu" class="text-xl font-semibold">--</div>
+        </div>
+        <div>
+          <div class="text-sm text-slate-500">RSS (MB)</div>
+          <div id="agent_rss" class="text-xl font-semibold">--</div>
+        </div>
+        <div>
+          <div class="text-sm text-slate-500">Hook max (ms)</div>
+          <div id="agent_hook" class="text-xl font-semibold">--</div>
+        </div>
+        <div>
+          <div class="text-sm text-slate-500">Poll drift max (ms)</div>
+          <div id="agent_drift" class="text-xl font-semibold">--</div>
+        </div>
+        <div>
+          <div class="text-sm text-slate-500">Queue</div>
+          <div id="agent_queue" class="text-xl font-semibold">--</div>
+        </div>
+      </div>
+      <canvas id="agent_chart" height="60" class="mt-3"></canvas>
+      <div id="agent_alarms" class="text-sm text-red-600 mt-2"></div>
+    </div>
+
     <div class="text-xs text-slate-500">Auto-refreshes every 5s. Data dir: {{ data_dir }}</div>
   </div>
 
@@ -137,12 +191,13 @@ function secsToHMS(sec){
 }
 async function loadData(){
   try{
-    const res = await fetch('/api/summary');
+    const res = await fetch(`/api/summary?w=${document.getElementById('apps_chart').clientWidth}`);
     const data = await res.json();
     const sum = data.summary || {};
     const gem = (data.gemini && data.gemini.ok && data.gemini.data) ? data.gemini.data : {};
 
     document.getElementById('total_time').textContent = secsToHMS(sum.total_time_sec||0);
+    document.getElementById('focus_time').textContent = (sum.time_in_focus_sec!=null) ? `in focus ${secsToHMS(sum.time_in_focus_sec)}` : '';
     document.getElementById('wpm').textContent = (sum.wpm||0).toFixed(1);
     document.getElementById('typing_words').textContent = sum.typing_words||0;
     document.getElementById('backspaces').textContent = sum.backspaces||0;
@@ -165,7 +220,7 @@ async function loadData(){
     const tba = sum.time_by_app_sec || {};
     const labels = Object.keys(tba);
     const values = labels.map(k => tba[k]);
-    document.getElementById('apps_meta').textContent = `${labels.length} apps`;
+    document.getElementById('apps_meta').textContent = `${data.apps_total ?? labels.length} apps`;
 
     const rows = labels
       .map(k => `<tr class='border-t border-slate-100'><td class='py-2 pr-4 font-mono'>${k}</td><td class='py-2'>${(tba[k]).toFixed(1)}</td></tr>`) 
@@ -193,6 +248,79 @@ async function loadData(){
 loadData();
 setInterval(loadData, 5000);
 
+let timelineChart;
+async function loadTimeline(){
+  try{
+    const days = document.getElementById('timeline_days').value;
+    const w = document.getElementById('timeline_chart').clientWidth;
+    const res = await fetch(`/api/timeline?days=${days}&w=${w}`);
+    const tl = await res.json();
+    const n = (tl.t || []).length;
+    const idle = (tl.idle || []).reduce((a,b)=>a+b, 0);
+    const shown = tl.points_total > n ? `, ${n} of ${tl.points_total} points` : '';
+    document.getElementById('timeline_meta').textContent = n ? `${tl.sec}s buckets, ${n - idle} active / ${idle} idle${shown}` : 'no activity buckets yet';
+    const fmt = days > 1 ? {month:'short', day:'numeric', hour:'2-digit', minute:'2-digit'} : {hour:'2-digit', minute:'2-digit'};
+    const ctx = document.getElementById('timeline_chart').getContext('2d');
+    if(timelineChart){ timelineChart.destroy(); }
+    timelineChart = new Chart(ctx, {
+      type: 'bar',
+      data: {
+        labels: (tl.t || []).map(t => new Date(t*1000).toLocaleString([], fmt)),
+        datasets: [
+          { label: 'Keys', data: tl.keys || [], backgroundColor: 'rgba(59,130,246,0.6)', stack: 'a' },
+          { label: 'Words', data: tl.words || [], backgroundColor: 'rgba(16,185,129,0.6)', stack: 'b' },
+          { label: 'Idle', data: (tl.idle || []).map(x => x ? 1 : 0), backgroundColor: 'rgba(148,163,184,0.5)', stack: 'a' }
+        ]
+      },
+      options: { responsive: true, animation: false, scales: { x: { ticks: { maxTicksLimit: 24 } }, y: { beginAtZero: true } } }
+    });
+  }catch(e){
+    console.error(e);
+  }
+}
+loadTimeline();
+setInterval(loadTimeline, 60000);
+document.getElementById('timeline_days').addEventListener('change', loadTimeline);
+
+let agentChart;
+async function loadAgent(){
+  try{
+    const res = await fetch('/api/agent?n=120');
+    const data = await res.json();
+    const rows = data.samples || [];
+    if(!rows.length){
+      document.getElementById('agent_meta').textContent = 'no self-telemetry yet';
+      return;
+    }
+    const last = rows[rows.length-1];
+    const hooks = Object.values(last.hooks || {});
+    document.getElementById('agent_cpu').textContent = last.cpu_pct.toFixed(2);
+    document.getElementById('agent_rss').textContent = last.rss_mb.toFixed(0);
+    document.getElementById('agent_hook').textContent = hooks.length ? Math.max(...hooks.map(h=>h.max_ms)).toFixed(2) : '--';
+    document.getElementById('agent_drift').textContent = (last.poll_drift||{}).max_ms ?? '--';
+    document.getElementById('agent_queue').textContent = last.queue;
+    document.getElementById('agent_meta').textContent = `${rows.length} samples, mouse interval ${last.mouse_interval_ms} ms`;
+    document.getElementById('agent_alarms').textContent = (last.alarms||[]).join('; ');
+    const ctx = document.getElementById('agent_chart').getContext('2d');
+    if(agentChart){ agentChart.destroy(); }
+    agentChart = new Chart(ctx, {
+      type: 'line',
+      data: {
+        labels: rows.map(r => new Date(r.ts*1000).toLocaleTimeString()),
+        datasets: [
+          { label: 'CPU %', data: rows.map(r => r.cpu_pct), borderColor: 'rgba(59,130,246,0.8)', pointRadius: 0, yAxisID: 'y' },
+          { label: 'RSS MB', data: rows.map(r => r.rss_mb), borderColor: 'rgba(234,88,12,0.8)', pointRadius: 0, yAxisID: 'y1' }
+        ]
+      },
+      options: { responsive: true, animation: false, scales: { y: { beginAtZero: true }, y1: { beginAtZero: true, position: 'right', grid: { drawOnChartArea: false } } } }
+    });
+  }catch(e){
+    console.error(e);
+  }
+}
+loadAgent();
+setInterval(loadAgent, 30000);
+
 async function analyzeStress(days=7){
   document.getElementById('stress_days').textContent = days;
   document.getElementById('stress_status').textContent = 'Analyzing...';
@@ -230,52 +358,125 @@ document.getElementById('stress_btn').addEventListener('click', ()=> analyzeStre
 """
 
 
+@instrument.timed('summarize_seconds')
 def summarize(sessions: list[Dict[str, Any]]) -> Dict[str, Any]:
     total_time = 0.0
+    focus = 0.0
     words = 0
     backspaces = 0
     keys = 0
     mouse = 0.0
     apps: Dict[str, float] = {}
+    cats: Dict[str, float] = {}
+    coalesced = 0
     for s in sessions:
         d = float(s.get('duration_sec', 0.0))
         total_time += d
+        focus += float(s.get('active_sec', d))
         words += int(s.get('words_typed', 0))
         backspaces += int(s.get('backspaces', 0))
         keys += int(s.get('keys_pressed', 0))
         mouse += float(s.get('mouse_distance', 0.0))
         exe = str(s.get('exe') or '').lower()
         apps[exe] = apps.get(exe, 0.0) + d
+        cat = s.get('category')
+        if cat:
+            cats[cat] = cats.get(cat, 0.0) + d
+        coalesced += int(s.get('coalesced', 0))
     switches = max(0, len(sessions) - 1)
     wpm = (words / (total_time / 60.0)) if total_time > 0 else 0.0
     return {
         'total_time_sec': total_time,
+        'time_in_focus_sec': focus,
         'typing_words': words,
         'wpm': wpm,
         'backspaces': backspaces,
         'keys_pressed': keys,
         'mouse_distance': mouse,
         'app_switches': switches,
+        'coalesced_switches': coalesced,
         'time_by_app_sec': apps,
+        'time_by_category_sec': cats,
     }
 
 
+@instrument.timed('load_sessions_seconds', scope='today')
 def load_sessions_today():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    date = __import__('time').strftime('%Y%m%d')
-    f = DATA_DIR / f'metrics-{date}.jsonl'
-    sessions = []
-    if f.exists():
-        with f.open('r', encoding='utf-8') as fh:
-            for line in fh:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    sessions.append(json.loads(line))
-                except Exception:
-                    continue
-    return sessions
+    date = time.strftime('%Y%m%d')
+    return logload.read_day(DATA_DIR / f'metrics-{date}.jsonl')
+
+def activity_timeline(sessions: list[Dict[str, Any]]) -> Dict[str, Any]:
+    # merges per-session activity buckets into one series keyed by bucket start time
+    sec = 0
+    slots: Dict[float, list] = {}
+    for s in sessions:
+        act = s.get('activity')
+        if not act:
+            continue
+        sec = sec or act['sec']
+        if act['sec'] != sec:
+            continue
+        for i, k in enumerate(act['keys']):
+            row = slots.setdefault(act['t0'] + i * sec, [0, 0, 0, 0.0])
+            row[0] += k
+            row[1] += act['words'][i]
+            row[2] += act['backspaces'][i]
+            row[3] += act['mouse'][i]
+    ts = sorted(slots)
+    return {
+        'sec': sec,
+        't': ts,
+        'keys': [slots[t][0] for t in ts],
+        'words': [slots[t][1] for t in ts],
+        'backspaces': [slots[t][2] for t in ts],
+        'mouse': [round(slots[t][3], 1) for t in ts],
+        'idle': [0 if (slots[t][0] or slots[t][3]) else 1 for t in ts],
+    }
+
+
+_DAY_TIMELINES: Dict[Path, tuple] = {}
+
+
+def day_files(days: int) -> list[Path]:
+    # existing metrics files of the last `days` days, newest first
+    now = time.time()
+    files = (DATA_DIR / f"metrics-{time.strftime('%Y%m%d', time.localtime(now - i * 86400))}.jsonl" for i in range(days))
+    return [f for f in files if f.exists()]
+
+
+def timeline_days(days: int) -> Dict[str, Any]:
+    # activity_timeline over several day files; each day's merge is kept in memory until its file changes.
+    # Days not cached are merged in the loader's workers, so only the per-day series come back.
+    files = day_files(days)[::-1]
+    stats = {f: f.stat() for f in files}
+    stale = [f for f in files if _DAY_TIMELINES.get(f, (None, None))[:2] != (stats[f].st_size, stats[f].st_mtime)]
+    for f, tl in zip(stale, logload.iter_days(stale, ('activity',), fn=activity_timeline)):
+        _DAY_TIMELINES[f] = (stats[f].st_size, stats[f].st_mtime, tl)
+    parts = [_DAY_TIMELINES[f][2] for f in files if _DAY_TIMELINES[f][2]['t']]
+    if not parts:
+        return activity_timeline([])
+    sec = parts[0]['sec']
+    parts = [p for p in parts if p['sec'] == sec]
+    out = {k: [] for k in ('t', 'keys', 'words', 'backspaces', 'mouse', 'idle')}
+    for p in parts:
+        start = 0
+        # a session crossing midnight can put buckets before the previous day's last one
+        while out['t'] and start < len(p['t']) and p['t'][start] <= out['t'][-1]:
+            t = p['t'][start]
+            j = bisect.bisect_left(out['t'], t)
+            if out['t'][j] != t:
+                for k in out:
+                    out[k].insert(j, 0)
+                out['t'][j] = t
+            for k in ('keys', 'words', 'backspaces', 'mouse'):
+                out[k][j] += p[k][start]
+            out['idle'][j] = 0 if (out['keys'][j] or out['mouse'][j]) else 1
+            start += 1
+        for k in out:
+            out[k].extend(p[k][start:])
+    return {'sec': sec, **out}
+
 
 def load_current_session_summary():
     f = DATA_DIR / 'current-session.json'
@@ -287,25 +488,42 @@ def load_current_session_summary():
     except Exception:
         return None
 
-def load_sessions_days(days: int = 7):
+@instrument.timed('load_sessions_seconds', scope='days')
+def load_sessions_days(days: int = 7, fields=None):
+    return list(iter_sessions_days(days, fields))
+
+
+def iter_sessions_days(days: int = 7, fields=None):
+    # sessions of the last `days` days, newest day first, streamed from the parallel loader
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    sessions = []
-    now = time.time()
-    for i in range(days):
-        t = now - i * 86400
-        date = time.strftime('%Y%m%d', time.localtime(t))
-        f = DATA_DIR / f'metrics-{date}.jsonl'
-        if f.exists():
-            with f.open('r', encoding='utf-8') as fh:
-                for line in fh:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        sessions.append(json.loads(line))
-                    except Exception:
-                        continue
-    return sessions
+    return logload.iter_sessions(day_files(days), fields)
+
+
+# what stress_features reads; everything else (titles, activity buckets) stays in the loader
+STRESS_FIELDS = ('start_ts', 'duration_sec', 'active_sec', 'words_typed', 'backspaces', 'keys_pressed',
+                 'mouse_distance', 'coalesced', 'exe')
+
+
+def tail_jsonl(f: Path, n: int, block: int = 64 * 1024):
+    # last n records without reading the whole file
+    if not f.exists() or n <= 0:
+        return []
+    with f.open('rb') as fh:
+        fh.seek(0, os.SEEK_END)
+        pos = fh.tell()
+        buf = b''
+        while pos > 0 and buf.count(b'\n') <= n:
+            step = min(block, pos)
+            pos -= step
+            fh.seek(pos)
+            buf = fh.read(step) + buf
+    out = []
+    for line in buf.splitlines()[-n:]:
+        try:
+            out.append(json.loads(line))
+        except Exception:
+            continue
+    return out
 
 
 def load_latest_gemini():
@@ -341,35 +559,80 @@ def api_summary():
         summary = summarize(sessions)
     latest = load_latest_gemini()
     gem = latest.get('gemini') if isinstance(latest, dict) else None
-    return jsonify({'summary': summary, 'gemini': gem})
+    apps = summary.get('time_by_app_sec') or {}
+    if request.args.get('w'):
+        # one bar per PX_PER_BAR pixels of chart width, the long tail summed as "other"
+        summary = {**summary, 'time_by_app_sec': top_n(apps, point_budget(request.args['w'], PX_PER_BAR, 5, 50))}
+    return jsonify({'summary': summary, 'gemini': gem, 'apps_total': len(apps)})
+
+
+@APP.route('/api/query', methods=['GET', 'POST'])
+def api_query():
+    # GET ?from=&to=&group_by=day,exe&metrics=time_sec,words&exe=&category=&title_contains=&min_duration=
+    # or POST the same keys as JSON (lists allowed)
+    spec = request.get_json(silent=True) if request.method == 'POST' else None
+    if not isinstance(spec, dict):
+        spec = request.args.to_dict()
+    try:
+        with instrument.timer('query_seconds'):
+            return jsonify({'ok': True, **run_query(DATA_DIR, spec)})
+    except QueryError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
 
 
-@APP.get('/api/stress')
-def api_stress():
+@APP.get('/api/timeline')
+def api_timeline():
+    # ?days=N (default today) &w=<chart px>: beyond the width's point budget the series is LTTB-downsampled on keys
     try:
-        days = int(request.args.get('days', '7'))
+        days = max(1, min(366, int(request.args.get('days', '1'))))
+    except ValueError:
+        days = 1
+    tl = timeline_days(days)
+    total = len(tl['t'])
+    if request.args.get('w'):
+        budget = point_budget(request.args['w'])
+        if total > budget:
+            idx = lttb(tl['t'], tl['keys'], budget)
+            for k in ('t', 'keys', 'words', 'backspaces', 'mouse', 'idle'):
+                tl[k] = [tl[k][i] for i in idx]
+    tl['points_total'] = total
+    return jsonify(tl)
+
+
+@APP.get('/api/agent')
+def api_agent():
+    try:
+        n = max(1, min(2880, int(request.args.get('n', '120'))))
     except Exception:
-        days = 7
-    sessions = load_sessions_days(days)
-    # build multi-day summary features
+        n = 120
+    f = DATA_DIR / f"agent-telemetry-{time.strftime('%Y%m%d')}.jsonl"
+    return jsonify({'samples': tail_jsonl(f, n)})
+
+
+@instrument.timed('stress_features_seconds')
+def stress_features(sessions: Iterable[Dict[str, Any]], days: int) -> Dict[str, Any]:
+    # multi-day summary features sent to Gemini by /api/stress
     daily: Dict[str, Any] = {}
     by_app: Dict[str, float] = {}
-    total = {'total_time_sec': 0.0, 'typing_words': 0, 'backspaces': 0, 'keys_pressed': 0, 'mouse_distance': 0.0, 'app_switches': 0}
+    total = {'total_time_sec': 0.0, 'time_in_focus_sec': 0.0, 'typing_words': 0, 'backspaces': 0, 'keys_pressed': 0, 'mouse_distance': 0.0, 'app_switches': 0, 'coalesced_switches': 0}
     last_title = None
     for s in sessions:
         ts = float(s.get('start_ts', 0))
         dstr = time.strftime('%Y-%m-%d', time.localtime(ts)) if ts else 'unknown'
         d = float(s.get('duration_sec', 0.0))
         total['total_time_sec'] += d
+        total['time_in_focus_sec'] += float(s.get('active_sec', d))
         total['typing_words'] += int(s.get('words_typed', 0))
         total['backspaces'] += int(s.get('backspaces', 0))
         total['keys_pressed'] += int(s.get('keys_pressed', 0))
         total['mouse_distance'] += float(s.get('mouse_distance', 0.0))
+        total['coalesced_switches'] += int(s.get('coalesced', 0))
         exe = str(s.get('exe') or '').lower()
         by_app[exe] = by_app.get(exe, 0.0) + d
         # daily aggregates
-        dd = daily.setdefault(dstr, {'time': 0.0, 'words': 0, 'backspaces': 0, 'keys': 0, 'mouse': 0.0, 'switches': 0})
+        dd = daily.setdefault(dstr, {'time': 0.0, 'active': 0.0, 'words': 0, 'backspaces': 0, 'keys': 0, 'mouse': 0.0, 'switches': 0})
         dd['time'] += d
+        dd['active'] += float(s.get('active_sec', d))
         dd['words'] += int(s.get('words_typed', 0))
         dd['backspaces'] += int(s.get('backspaces', 0))
         dd['keys'] += int(s.get('keys_pressed', 0))
@@ -377,14 +640,22 @@ def api_stress():
         # naive switch count by session boundaries
         dd['switches'] += 1
 
-    # features for Gemini
-    features = {
+    return {
         'window_days': days,
         'totals': total,
         'by_app_top': sorted([{ 'exe': k, 'time_sec': v } for k,v in by_app.items()], key=lambda x: -x['time_sec'])[:10],
         'per_day': [ {'date': k, **v, 'wpm': (v['words']/ (v['time']/60.0) if v['time']>0 else 0.0)} for k,v in sorted(daily.items()) ],
     }
 
+
+@APP.get('/api/stress')
+def api_stress():
+    try:
+        days = int(request.args.get('days', '7'))
+    except Exception:
+        days = 7
+    features = stress_features(iter_sessions_days(days, STRESS_FIELDS), days)
+
     # call Gemini
     client = GeminiClient()
     if not client.enabled():
@@ -397,30 +668,11 @@ def api_stress():
         f"MetricsWindow: {json.dumps(features, ensure_ascii=False)}\n"
     )
 
-    url = f"/api/stress"
-    # reuse score_metrics transport but different prompt via same endpoint shape
-    # build a temporary request using the same generateContent call
     try:
-        # mimic client.score_metrics but with custom prompt
-        endpoint = os.getenv('GEMINI_ENDPOINT', 'https://generativelanguage.googleapis.com/v1beta/models')
-        model = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
-        api_key = os.getenv('GEMINI_API_KEY')
-        headers = {"x-goog-api-key": api_key, "Content-Type": "application/json"}
-        body = {'contents': [{'parts': [{'text': prompt}]}]}
-        import requests
-        r = requests.post(f"{endpoint}/{model}:generateContent", headers=headers, json=body, timeout=20)
-        r.raise_for_status()
-        resp = r.json()
-        text = resp.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-        data = None
-        try:
-            data = json.loads(text)
-        except Exception:
-            st = text.find('{'); en = text.rfind('}')
-            if st!=-1 and en!=-1 and en>st:
-                data = json.loads(text[st:en+1])
-        if not isinstance(data, dict):
-            return jsonify({'ok': False, 'error': 'Parse failure', 'raw': resp}), 200
+        res = client.generate_json(prompt, schema=STRESS_SCHEMA, timeout=20)
+        if not res['ok']:
+            return jsonify({'ok': False, 'error': res.get('error', 'Parse failure'), 'text': res.get('text', '')}), 200
+        data = res['data']
         # persist
         out = {
             'ts': time.time(),
@@ -0,0 +1,60 @@
+from typing import Dict, List, Sequence
+
+# Server-side thinning for dashboard charts. Point budgets come from the chart's pixel width: more than about
+# one point per PX_PER_POINT pixels cannot be seen, only paid for in payload and canvas work.
+PX_PER_POINT = 2
+PX_PER_BAR = 40
+MIN_POINTS = 50
+MAX_POINTS = 4000
+
+
+def point_budget(width_px, px_per_point: int = PX_PER_POINT, lo: int = MIN_POINTS, hi: int = MAX_POINTS) -> int:
+    try:
+        width = int(float(width_px))
+    except (TypeError, ValueError):
+        width = 1000
+    return max(lo, min(hi, width // max(1, px_per_point)))
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], n: int) -> List[int]:
+    # Largest-Triangle-Three-Buckets: indices of n points (first and last always kept) that preserve the
+    # visual shape; each bucket keeps the point spanning the largest triangle with the previous pick and the
+    # next bucket's average.
+    size = len(xs)
+    if n >= size:
+        return list(range(size))
+    if n < 3:
+        return [0, size - 1][:max(0, n)]
+    every = (size - 2) / (n - 2)
+    picks = [0]
+    a = 0
+    for i in range(n - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, size)
+        if nhi <= nlo:
+            nlo, nhi = size - 1, size
+        cnt = nhi - nlo
+        avg_x = sum(xs[nlo:nhi]) / cnt
+        avg_y = sum(ys[nlo:nhi]) / cnt
+        ax, ay = xs[a], ys[a]
+        best, best_area = lo, -1.0
+        dx, dy = avg_x - ax, avg_y - ay
+        for j in range(lo, hi):
+            area = abs(dx * (ys[j] - ay) - (xs[j] - ax) * dy)
+            if area > best_area:
+                best, best_area = j, area
+        picks.append(best)
+        a = best
+    picks.append(size - 1)
+    return picks
+
+
+def top_n(values: Dict[str, float], n: int, other: str = 'other') -> Dict[str, float]:
+    # n largest entries in descending order, the remainder summed under `other`
+    items = sorted(values.items(), key=lambda kv: -kv[1])
+    if len(items) <= n:
+        return dict(items)
+    out = dict(items[:n])
+    out[other] = out.get(other, 0.0) + sum(v for _, v in items[n:])
+    return out
@@ -1,8 +1,47 @@
 import os
 import time
 import json
-from typing import Dict, Any, Optional
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+
+from . import instrument
+from .llm_response import SCORE_SCHEMA, parse_stream, parse_text, validate
+
+
+def estimate_tokens(text: str) -> int:
+    # rough heuristic (~4 chars per token), good enough for budgeting prompts
+    return len(text) // 4 + 1
+
+
+def batch_prompt(header: str, batch: List[Tuple[str, Any, str]]) -> str:
+    return header + 'Items: [' + ', '.join(text for _, _, text in batch) + ']\n'
+
+
+def pack_batches(items: List[Tuple[str, Any]], token_budget: int, max_items: int,
+                 header: str = '') -> List[List[Tuple[str, Any, str]]]:
+    # Sized on the whole prompt batch_prompt() builds (header included), so estimate_tokens(prompt) stays
+    # within token_budget; only an item too large on its own gets a batch that exceeds it.
+    # Results are mapped back by id, so ids must be unique.
+    seen = set()
+    dups = sorted({i for i, _ in items if i in seen or seen.add(i)})
+    if dups:
+        raise ValueError(f"duplicate item ids: {', '.join(dups[:5])}")
+    budget_chars = token_budget * 4
+    empty = len(batch_prompt(header, []))
+    batches = []
+    cur: List[Tuple[str, Any, str]] = []
+    used = empty
+    for item_id, payload in items:
+        text = json.dumps({'id': item_id, 'data': payload}, ensure_ascii=False)
+        cost = len(text) + (2 if cur else 0)
+        if cur and (used + cost > budget_chars or len(cur) >= max_items):
+            batches.append(cur)
+            cur, used, cost = [], empty, len(text)
+        cur.append((item_id, payload, text))
+        used += cost
+    if cur:
+        batches.append(cur)
+    return batches
 
 
 class GeminiClient:
@@ -10,10 +49,140 @@ class GeminiClient:
         self.api_key = os.getenv('GEMINI_API_KEY')
         self.model = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
         self.endpoint = os.getenv('GEMINI_ENDPOINT', 'https://generativelanguage.googleapis.com/v1beta/models')
+        self.stream = os.getenv('GEMINI_STREAM', '1') != '0'
 
     def enabled(self) -> bool:
         return bool(self.api_key)
 
+    @instrument.timed('gemini_call_seconds', op='generate_text')
+    def generate_text(self, prompt: str, timeout: float = 20) -> str:
+        url = f"{self.endpoint}/{self.model}:generateContent"
+        body = {'contents': [{'parts': [{'text': prompt}]}]}
+        headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
+        import requests  # ~100 ms to import; the dashboard and portal load this module without calling out
+        r = requests.post(url, json=body, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+        return data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
+
+    def stream_text(self, prompt: str, timeout: float = 20):
+        # Yields text deltas from the SSE streaming endpoint; closing the generator drops the connection.
+        url = f"{self.endpoint}/{self.model}:streamGenerateContent?alt=sse"
+        body = {'contents': [{'parts': [{'text': prompt}]}]}
+        headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
+        import requests
+        with requests.post(url, json=body, headers=headers, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                try:
+                    event = json.loads(line[5:].strip())
+                except Exception:
+                    continue
+                for part in event.get('candidates', [{}])[0].get('content', {}).get('parts', []) or []:
+                    if part.get('text'):
+                        yield part['text']
+
+    @instrument.timed('gemini_call_seconds', op='generate_json')
+    def generate_json(self, prompt: str, schema: Optional[Dict[str, Dict[str, Any]]] = None,
+                      timeout: float = 20, retries: int = 2) -> Dict[str, Any]:
+        # Returns {'ok': True, 'data', 'repaired', 'elapsed_sec'} or {'ok': False, 'error', 'text'?}.
+        res: Dict[str, Any] = {'ok': False, 'error': 'not attempted'}
+        for attempt in range(max(1, retries)):
+            t0 = time.perf_counter()
+            try:
+                if self.stream:
+                    chunks = self.stream_text(prompt, timeout=timeout)
+                    try:
+                        res = parse_stream(chunks, schema)
+                    finally:
+                        chunks.close()
+                else:
+                    res = parse_text(self.generate_text(prompt, timeout=timeout), schema)
+            except Exception as e:
+                res = {'ok': False, 'error': str(e)}
+            res['elapsed_sec'] = time.perf_counter() - t0
+            if res['ok']:
+                return res
+            if attempt + 1 < retries:
+                time.sleep(1.0)
+        return res
+
+    @instrument.timed('gemini_call_seconds', op='batch_generate')
+    def batch_generate(self, items: List[Tuple[str, Any]], instruction: str, schema_hint: Dict[str, Any],
+                       item_schema: Optional[Dict[str, Dict[str, Any]]] = None, token_budget: int = 6000, max_items: int = 25,
+                       concurrency: int = 4, timeout: float = 30) -> Dict[str, Any]:
+        # Packs many (id, payload) items into token-budgeted prompts and maps results back by id.
+        if not self.enabled():
+            return {'enabled': False}
+        items = [(str(i), p) for i, p in items]
+        header = (
+            f"{instruction} Return STRICT JSON only, no prose: one object whose keys are the item ids "
+            f"and whose values follow the schema {json.dumps(schema_hint)}. Include every id exactly once.\n"
+        )
+        header_tokens = estimate_tokens(header)
+        batches = pack_batches(items, token_budget, max_items, header)
+
+        def run(batch):
+            prompt = batch_prompt(header, batch)
+            out: Dict[str, Any] = {}
+            res = self.generate_json(prompt, timeout=timeout, retries=1)
+            if not res['ok']:
+                for i, _, _ in batch:
+                    out[i] = {'ok': False, 'error': res.get('error')}
+                return out, estimate_tokens(prompt)
+            parsed = res['data']
+            for i, _, _ in batch:
+                item = parsed.get(i)
+                if not isinstance(item, dict):
+                    out[i] = {'ok': False, 'error': 'missing in response'}
+                    continue
+                cleaned, errors = validate(item, item_schema) if item_schema else (item, [])
+                if errors:
+                    out[i] = {'ok': False, 'error': 'Schema: ' + '; '.join(errors), 'data': item}
+                else:
+                    out[i] = {'ok': True, 'data': cleaned}
+            return out, estimate_tokens(prompt)
+
+        t0 = time.perf_counter()
+        results: Dict[str, Any] = {}
+        prompt_tokens = 0
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for out, tokens in pool.map(run, batches):
+                results.update(out)
+                prompt_tokens += tokens
+        elapsed = time.perf_counter() - t0
+        n = len(items)
+        ok = sum(1 for r in results.values() if r['ok'])
+        stats = {
+            'items': n,
+            'batches': len(batches),
+            'ok': ok,
+            'failed': n - ok,
+            'elapsed_sec': elapsed,
+            'items_per_sec': (n / elapsed) if elapsed > 0 else 0.0,
+            'prompt_tokens_est': prompt_tokens,
+            'tokens_per_item': (prompt_tokens / n) if n else 0.0,
+            'header_tokens_est': header_tokens,
+        }
+        return {'enabled': True, 'ok': ok == n, 'results': results, 'stats': stats}
+
+    def score_metrics_batch(self, role: str, summaries: Dict[str, Dict[str, Any]], weights: Optional[Dict[str, float]] = None,
+                            **kwargs) -> Dict[str, Any]:
+        weights = weights or {}
+        schema_hint = {
+            "score": "integer 0-100",
+            "grade": "string one of [A, B, C, D, E, F]",
+            "notes": "short string guidance",
+            "rationale": "concise string"
+        }
+        instruction = (
+            "You are a performance evaluator. Score each metrics window independently, reflecting role and weights. "
+            f"Role: {role}. Weights: {json.dumps(weights, ensure_ascii=False)}."
+        )
+        return self.batch_generate(list(summaries.items()), instruction, schema_hint, item_schema=SCORE_SCHEMA, **kwargs)
+
     def score_metrics(self, role: str, summary: Dict[str, Any], weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
         if not self.enabled():
             return {'enabled': False}
@@ -31,30 +200,10 @@ class GeminiClient:
             f"Weights: {json.dumps(weights, ensure_ascii=False)}\n"
             f"Metrics: {json.dumps(summary, ensure_ascii=False)}\n"
         )
-        url = f"{self.endpoint}/{self.model}:generateContent"
-        body = {'contents': [{'parts': [{'text': prompt}]}]}
-        headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
-        # simple retry
-        last_err = None
-        for _ in range(2):
-            try:
-                r = requests.post(url, json=body, headers=headers, timeout=15)
-                r.raise_for_status()
-                data = r.json()
-                text = data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', '')
-                parsed = None
-                try:
-                    parsed = json.loads(text)
-                except Exception:
-                    # try to extract JSON block if the model added extra text
-                    start = text.find('{')
-                    end = text.rfind('}')
-                    if start != -1 and end != -1 and end > start:
-                        parsed = json.loads(text[start:end+1])
-                if parsed and isinstance(parsed, dict) and 'score' in parsed:
-                    return {'enabled': True, 'ok': True, 'data': parsed}
-                return {'enabled': True, 'ok': False, 'raw': data, 'text': text}
-            except Exception as e:
-                last_err = str(e)
-                time.sleep(1.0)
-        return {'enabled': True, 'ok': False, 'error': last_err}
+        res = self.generate_json(prompt, schema=SCORE_SCHEMA, timeout=15, retries=2)
+        if res['ok']:
+            return {'enabled': True, 'ok': True, 'data': res['data']}
+        out = {'enabled': True, 'ok': False, 'error': res.get('error')}
+        if 'text' in res:
+            out['text'] = res['text']
+        return out
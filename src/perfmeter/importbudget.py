@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+# Cold-start check for the three entry points: each target runs in a fresh interpreter under -X importtime,
+# best of --runs. `import_ms` is the summed cumulative time of top-level imports beyond what a bare
+# `python -c pass` imports (site, encodings: fixed per environment); `wall_ms` is the whole process.
+# Exit status 1 when any target fails to start or its import_ms is over budget.
+SRC = Path(__file__).resolve().parents[1]
+TARGETS: Dict[str, List[str]] = {
+    'perfmeter --help': ['-m', 'perfmeter', '--help'],
+    'dashboard': ['-c', 'import perfmeter.dashboard'],
+    'job_portal': ['-c', 'import job_portal.app'],
+}
+# Set from the measured spread, not the floor: best-of-3 came in at 20-65 ms for --help and 130-263 ms for
+# either web app (Flask alone is ~150 ms) on the same machine, so each budget sits ~1.5x above the worst
+# observed run. Pulling in a heavy dependency at import (pandas, numpy, PyPDF2, requests) still trips it.
+BUDGET_MS = {
+    'perfmeter --help': 100.0,
+    'dashboard': 400.0,
+    'job_portal': 400.0,
+}
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, float]]:
+    # top-level (directly imported) modules with cumulative ms
+    out = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m and len(m.group(3)) == 1:
+            out.append((m.group(4), int(m.group(2)) / 1000.0))
+    return out
+
+
+def measure(args: List[str], runs: int = 5, skip=frozenset()) -> Dict[str, Any]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(SRC), os.getenv('PYTHONPATH', '')])))
+    best = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', *args], env=env, capture_output=True, text=True)
+        wall = (time.perf_counter() - t0) * 1000
+        mods = [(n, ms) for n, ms in parse_importtime(proc.stderr) if n not in skip]
+        res = {
+            'ok': proc.returncode == 0,
+            'wall_ms': round(wall, 1),
+            'import_ms': round(sum(ms for _, ms in mods), 1),
+            'top': [{'module': n, 'ms': round(ms, 1)} for n, ms in sorted(mods, key=lambda x: -x[1])[:5]],
+            'all': [{'module': n, 'ms': ms} for n, ms in mods],
+        }
+        if not res['ok']:
+            res['error'] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f'exit {proc.returncode}'
+        # a failed run's partial import time says nothing about the budget: only compare successful runs
+        if best is None or res['ok'] and (not best['ok'] or res['import_ms'] < best['import_ms']):
+            best = res
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import budget for perfmeter, dashboard and job portal')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    report = {}
+    failed = False
+    startup = frozenset(t['module'] for t in measure(['-c', 'pass'], 1, frozenset())['all'])
+    for name, target in TARGETS.items():
+        res = measure(target, args.runs, startup)
+        del res['all']
+        res['budget_ms'] = BUDGET_MS[name]
+        res['over'] = not res['ok'] or res['import_ms'] > BUDGET_MS[name]
+        failed |= res['over']
+        report[name] = res
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, res in report.items():
+            mark = 'OVER' if res['over'] else 'ok'
+            print(f"{name:18s} import {res['import_ms']:7.1f} ms / {res['budget_ms']:5.0f} ms  wall {res['wall_ms']:7.1f} ms  {mark}")
+            if res.get('error'):
+                print(f"  error: {res['error']}")
+            print('  ' + ', '.join(f"{t['module']} {t['ms']}" for t in res['top']))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from functools import wraps
+from typing import Dict, Any, Tuple
+
+# PERFMETER_METRICS=0 turns every hook into a no-op: decorators return the function unchanged and
+# timer() hands back a shared null context, so the disabled cost is one global lookup.
+ENABLED = os.getenv('PERFMETER_METRICS', '1') != '0'
+WINDOW = int(os.getenv('PERFMETER_METRICS_WINDOW', '2048'))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Series:
+    # count/sum since start; quantiles over a ring of the most recent WINDOW samples
+    __slots__ = ('count', 'total', 'ring', 'pos')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.ring = array('d')
+        self.pos = 0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if len(self.ring) < WINDOW:
+            self.ring.append(value)
+        else:
+            self.ring[self.pos] = value
+            self.pos = (self.pos + 1) % WINDOW
+
+    def quantiles(self):
+        vals = sorted(self.ring)
+        if not vals:
+            return [(q, 0.0) for q in QUANTILES]
+        return [(q, vals[min(len(vals) - 1, int(q * len(vals)))]) for q in QUANTILES]
+
+
+_SERIES: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Series] = {}
+_LOCK = threading.Lock()
+
+
+def _key(name: str, labels: Dict[str, Any]):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _record(key, seconds: float):
+    with _LOCK:
+        s = _SERIES.get(key)
+        if s is None:
+            s = _SERIES[key] = Series()
+        s.add(seconds)
+
+
+def observe(name: str, seconds: float, **labels):
+    _record(_key(name, labels), seconds)
+
+
+class _Timer:
+    __slots__ = ('key', 't0')
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.key = _key(name, labels)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.key, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+def timer(name: str, **labels):
+    return _Timer(name, labels) if ENABLED else _NULL
+
+
+def timed(name: str, **labels):
+    key = _key(name, labels)
+
+    def deco(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(key, time.perf_counter() - t0)
+        return wrapper
+    return deco
+
+
+class TimedConnection(sqlite3.Connection):
+    # sqlite3.connect(..., factory=TimedConnection): times execute/executemany (statement prepare + first step)
+    def execute(self, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            observe('db_query_seconds', time.perf_counter() - t0, op=sql.lstrip()[:6].upper())
+
+    def executemany(self, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            observe('db_query_seconds', time.perf_counter() - t0, op=sql.lstrip()[:6].upper())
+
+
+def connection_factory():
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+
+def _escape(v) -> str:
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render_prometheus() -> str:
+    with _LOCK:
+        snap = [(name, labels, s.count, s.total, s.quantiles()) for (name, labels), s in sorted(_SERIES.items())]
+    lines = []
+    seen = set()
+    for name, labels, count, total, qs in snap:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# TYPE {name} summary')
+        for q, v in qs:
+            lines.append(f'{name}{_fmt_labels(labels, [("quantile", q)])} {v:.6f}')
+        lines.append(f'{name}_sum{_fmt_labels(labels)} {total:.6f}')
+        lines.append(f'{name}_count{_fmt_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _LOCK:
+        _SERIES.clear()
+
+
+def install_flask(app, service: str):
+    # request timing hooks plus GET /metrics (Prometheus text format)
+    from flask import g, request
+
+    @app.get('/metrics')
+    def metrics():
+        return app.response_class(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _metrics_stop(resp):
+        t0 = g.pop('_metrics_t0', None)
+        if t0 is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            observe('http_request_seconds', time.perf_counter() - t0, service=service, route=rule,
+                    method=request.method, status=resp.status_code)
+        return resp
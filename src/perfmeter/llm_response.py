@@ -0,0 +1,194 @@
+import json
+import math
+import re
+from typing import Dict, Any, Optional, Tuple, List, Iterable
+
+# Per-endpoint schemas: field -> spec. Supported spec keys:
+#   type: int | float | str | list, required, min, max, enum, max_items
+SCORE_SCHEMA: Dict[str, Dict[str, Any]] = {
+    'score': {'type': 'int', 'required': True, 'min': 0, 'max': 100},
+    'grade': {'type': 'str', 'enum': ['A', 'B', 'C', 'D', 'E', 'F']},
+    'notes': {'type': 'str'},
+    'rationale': {'type': 'str'},
+}
+
+STRESS_SCHEMA: Dict[str, Dict[str, Any]] = {
+    'level': {'type': 'str', 'required': True, 'enum': ['low', 'medium', 'high']},
+    'score': {'type': 'int', 'required': True, 'min': 0, 'max': 100},
+    'confidence': {'type': 'float', 'min': 0.0, 'max': 1.0},
+    'signals': {'type': 'list', 'max_items': 10},
+    'notes': {'type': 'str'},
+}
+
+FILTERS_SCHEMA: Dict[str, Dict[str, Any]] = {
+    'must_keywords': {'type': 'list', 'required': True, 'max_items': 5},
+    'nice_keywords': {'type': 'list', 'max_items': 5},
+    'min_words': {'type': 'int', 'min': 0},
+    'notes': {'type': 'str'},
+}
+
+
+class JsonObjectExtractor:
+    # Incrementally scans text chunks and returns the first complete top-level {...} object text.
+    def __init__(self):
+        self._buf: List[str] = []
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.done:
+            return None
+        for ch in chunk:
+            if not self._started:
+                if ch != '{':
+                    continue
+                self._started = True
+            self._buf.append(ch)
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == '\\':
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                continue
+            if ch == '"':
+                self._in_str = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    return ''.join(self._buf)
+        return None
+
+    def partial(self) -> str:
+        return ''.join(self._buf)
+
+    def close_partial(self) -> str:
+        # Terminate a truncated object after its last complete top-level member. A member still open when
+        # the stream ended is dropped whole: a cut-off number ("4" of 45) or string is not a value.
+        text = self.partial()
+        if not text:
+            return ''
+        depth = 0
+        safe = 0
+        in_str = esc = False
+        for i, ch in enumerate(text):
+            if in_str:
+                if esc:
+                    esc = False
+                elif ch == '\\':
+                    esc = True
+                elif ch == '"':
+                    in_str = False
+                continue
+            if ch == '"':
+                in_str = True
+            elif ch in '{[':
+                depth += 1
+                if depth == 1:
+                    safe = i + 1
+            elif ch in '}]':
+                depth -= 1
+            elif ch == ',' and depth == 1:
+                safe = i
+        return text[:safe] + '}'
+
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"'})
+
+
+def loads_repaired(text: str) -> Tuple[Any, bool]:
+    try:
+        return json.loads(text), False
+    except Exception:
+        pass
+    fixed = _TRAILING_COMMA.sub(r'\1', text.translate(_SMART_QUOTES))
+    return json.loads(fixed), True
+
+
+def validate(data: Any, schema: Dict[str, Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    # Returns (cleaned, errors). Cheap coercions (numeric strings, enum case, over-long lists) are applied.
+    if not isinstance(data, dict):
+        return None, ['not an object']
+    out = dict(data)
+    errors: List[str] = []
+    for key, spec in schema.items():
+        if key not in out or out[key] is None:
+            if spec.get('required'):
+                errors.append(f'{key}: missing')
+            continue
+        val = out[key]
+        typ = spec.get('type')
+        try:
+            if typ == 'int':
+                val = int(round(float(val)))
+            elif typ == 'float':
+                val = float(val)
+            elif typ == 'str':
+                val = str(val)
+            elif typ == 'list':
+                if isinstance(val, str):
+                    val = [x.strip() for x in val.split(',') if x.strip()]
+                if not isinstance(val, list):
+                    raise ValueError('expected list')
+                val = [str(x) for x in val][:spec.get('max_items', len(val))]
+            if typ == 'float' and not math.isfinite(val):
+                raise ValueError('not finite')
+        except (TypeError, ValueError, OverflowError):
+            errors.append(f'{key}: expected {typ}')
+            continue
+        if 'min' in spec and val < spec['min']:
+            errors.append(f"{key}: below {spec['min']}")
+        if 'max' in spec and val > spec['max']:
+            errors.append(f"{key}: above {spec['max']}")
+        if 'enum' in spec:
+            match = [e for e in spec['enum'] if e.lower() == val.strip().lower()]
+            if not match:
+                errors.append(f'{key}: not one of {spec["enum"]}')
+            else:
+                val = match[0]
+        out[key] = val
+    return (out if not errors else None), errors
+
+
+def parse_stream(chunks: Iterable[str], schema: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    # Consumes chunks only until the first complete JSON object; the caller can then drop the stream.
+    ext = JsonObjectExtractor()
+    text_parts: List[str] = []
+    obj_text = None
+    for chunk in chunks:
+        text_parts.append(chunk)
+        obj_text = ext.feed(chunk)
+        if obj_text is not None:
+            break
+    truncated = obj_text is None
+    if truncated:
+        obj_text = ext.close_partial()
+    text = ''.join(text_parts)
+    if not obj_text:
+        return {'ok': False, 'error': 'No JSON object', 'text': text}
+    if truncated and obj_text == '{}':
+        return {'ok': False, 'error': 'Truncated before the first complete field', 'text': text}
+    try:
+        data, repaired = loads_repaired(obj_text)
+    except Exception as e:
+        return {'ok': False, 'error': f'Parse failure: {e}', 'text': text}
+    repaired = repaired or truncated
+    if schema is not None:
+        data, errors = validate(data, schema)
+        if errors:
+            return {'ok': False, 'error': 'Schema: ' + '; '.join(errors), 'text': text}
+    elif not isinstance(data, dict):
+        return {'ok': False, 'error': 'Parse failure', 'text': text}
+    return {'ok': True, 'data': data, 'repaired': repaired}
+
+
+def parse_text(text: str, schema: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    return parse_stream([text or ''], schema)
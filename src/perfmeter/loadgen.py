@@ -0,0 +1,120 @@
+import argparse
+import heapq
+import json
+import random
+import threading
+import time
+from typing import Dict, Any, List
+
+from .uploader import CollectorClient
+
+APPS = ['code.exe', 'chrome.exe', 'outlook.exe', 'teams.exe', 'excel.exe', 'slack.exe', 'explorer.exe', 'winword.exe']
+ROLES = ['coder', 'engineer', 'hr']
+
+
+def synth_session(rnd: random.Random, start_ts: float) -> Dict[str, Any]:
+    dur = rnd.uniform(5, 300)
+    keys = int(dur * rnd.uniform(0, 3))
+    return {
+        'exe': rnd.choice(APPS),
+        'title': f'window {rnd.randrange(50)}',
+        'start_ts': start_ts,
+        'end_ts': start_ts + dur,
+        'duration_sec': dur,
+        'active_sec': dur * rnd.uniform(0.5, 1.0),
+        'words_typed': keys // 6,
+        'backspaces': keys // 12,
+        'keys_pressed': keys,
+        'mouse_distance': dur * rnd.uniform(0, 200),
+        'end_reason': 'switch',
+    }
+
+
+def percentile(vals: List[float], q: float) -> float:
+    if not vals:
+        return 0.0
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(q * len(vals)))]
+
+
+def run(url: str, agents: int = 1000, duration: float = 30, interval: float = 5, sessions: int = 20,
+        concurrency: int = 64, teams: int = 10, seed: int = 1) -> Dict[str, Any]:
+    # Each simulated agent pushes one batch of `sessions` every `interval` seconds (staggered start).
+    rnd = random.Random(seed)
+    clients = [CollectorClient(url, f'dev-{i:05d}', team=f'team-{i % teams:02d}', role=ROLES[i % len(ROLES)])
+               for i in range(agents)]
+    t0 = time.monotonic()
+    due = [(t0 + rnd.uniform(0, interval), i) for i in range(agents)]
+    heapq.heapify(due)
+    lock = threading.Lock()
+    lat: List[float] = []
+    stats = {'requests': 0, 'sessions': 0, 'errors': 0, 'late': 0.0}
+    end = t0 + duration
+
+    def worker():
+        wrnd = random.Random(rnd.random())
+        while True:
+            with lock:
+                if not due or due[0][0] >= end:
+                    return
+                when, i = heapq.heappop(due)
+            delay = when - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                stats['late'] = max(stats['late'], -delay)
+            now = time.time()
+            batch = [synth_session(wrnd, now - wrnd.uniform(0, 3600)) for _ in range(sessions)]
+            s0 = time.perf_counter()
+            try:
+                clients[i].push(batch)
+                ok = True
+            except Exception:
+                ok = False
+            el = time.perf_counter() - s0
+            with lock:
+                stats['requests'] += 1
+                if ok:
+                    stats['sessions'] += len(batch)
+                    lat.append(el)
+                else:
+                    stats['errors'] += 1
+                heapq.heappush(due, (when + interval, i))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    return {
+        'agents': agents,
+        'elapsed_sec': round(elapsed, 2),
+        'requests': stats['requests'],
+        'errors': stats['errors'],
+        'sessions': stats['sessions'],
+        'target_sessions_per_sec': round(agents * sessions / interval, 1),
+        'sessions_per_sec': round(stats['sessions'] / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(lat, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(lat, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(lat, 0.99) * 1000, 2),
+        'max_schedule_lag_sec': round(stats['late'], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate many agents pushing to the fleet collector')
+    parser.add_argument('--url', default='http://127.0.0.1:8780')
+    parser.add_argument('--agents', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between pushes per agent')
+    parser.add_argument('--sessions', type=int, default=20, help='Sessions per push')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--teams', type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps(run(args.url, args.agents, args.duration, args.interval, args.sessions,
+                         args.concurrency, args.teams), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import orjson
+    loads = orjson.loads
+    BACKEND = 'orjson'
+except ImportError:
+    loads = json.loads
+    BACKEND = 'json'
+
+# Multi-day reader for metrics-YYYYMMDD.jsonl. Day files are parsed in a process pool (JSON decoding is
+# CPU-bound and neither decoder releases the GIL, so threads would not help) and handed back in day order,
+# one day at a time, so callers can fold them as a stream instead of holding every session at once.
+# `fields` projects rows down to the keys a caller reads, which also keeps what workers pickle back small
+# (activity buckets are most of a row). A per-day reducer `fn` (a module-level function, so it pickles) runs
+# in the worker too, so only its result crosses the process boundary. Workers = PERFMETER_LOAD_WORKERS, default one per CPU up to
+# MAX_WORKERS; 0 or 1, or fewer than MIN_PARALLEL_DAYS files, parses in-process.
+MAX_WORKERS = 8
+MIN_PARALLEL_DAYS = 4
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def default_workers() -> int:
+    env = os.getenv('PERFMETER_LOAD_WORKERS')
+    if env is not None:
+        try:
+            return max(0, int(env))
+        except ValueError:
+            pass
+    return min(MAX_WORKERS, os.cpu_count() or 1)
+
+
+def read_day(path: Path, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    # bad lines (a torn write at the end of today's file) are skipped, as everywhere else
+    try:
+        raw = path.read_bytes()
+    except OSError:
+        return []
+    out = []
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rec = loads(line)
+        except ValueError:
+            continue
+        if fields is not None:
+            rec = {k: rec[k] for k in fields if k in rec}
+        out.append(rec)
+    return out
+
+
+def _read(path: Path, fields: Optional[Sequence[str]], fn: Optional[Callable]) -> Any:
+    rows = read_day(path, fields)
+    return fn(rows) if fn is not None else rows
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # kept for the life of the process: worker start-up (a spawn on Windows) costs more than a day file
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL, _POOL_WORKERS = ProcessPoolExecutor(max_workers=workers), workers
+        return _POOL
+
+
+def iter_days(paths: Iterable[Path], fields: Optional[Sequence[str]] = None, workers: Optional[int] = None,
+              fn: Optional[Callable] = None) -> Iterator[Any]:
+    # one item per path, in the order given: the day's rows (missing file: []), or fn(rows)
+    paths = list(paths)
+    workers = default_workers() if workers is None else workers
+    if fields is None and fn is None:
+        # whole rows cost about as much to unpickle in the parent as to parse there
+        workers = 0
+    if workers <= 1 or len(paths) < MIN_PARALLEL_DAYS:
+        for p in paths:
+            yield _read(p, fields, fn)
+        return
+    fields = tuple(fields) if fields is not None else None
+    try:
+        pool = _pool(workers)
+        # at most 2 days per worker in flight, so parsed days do not pile up ahead of a slow consumer
+        pending = deque(pool.submit(_read, p, fields, fn) for p in paths[:2 * workers])
+    except (OSError, RuntimeError) as e:
+        # no subprocesses (sandboxed service, interpreter shutting down): parse here instead
+        print(f"[logload] process pool unavailable, reading in-process: {e}")
+        for p in paths:
+            yield _read(p, fields, fn)
+        return
+    queued = len(pending)
+    while pending:
+        day = pending.popleft().result()
+        if queued < len(paths):
+            pending.append(pool.submit(_read, paths[queued], fields, fn))
+            queued += 1
+        yield day
+
+
+def iter_sessions(paths: Iterable[Path], fields: Optional[Sequence[str]] = None,
+                  workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    for day in iter_days(paths, fields, workers):
+        yield from day
@@ -6,47 +6,62 @@ import threading
 import time
 from pathlib import Path
 
-import yaml
-from dotenv import load_dotenv
-import webbrowser
 import os
 
-from .rules import load_rules
-from .tracker import ActiveAppTracker
+from .rules import LiveRules
 from .aggregator import Aggregator
-from .gemini_client import GeminiClient
+from .coalesce import Coalescer
 
 
 def summarize_for_gemini(sessions):
     total_time = 0.0
+    focus = 0.0
     words = 0
     backspaces = 0
     keys = 0
     mouse = 0.0
     apps = {}
+    cats = {}
+    coalesced = 0
     for s in sessions:
         d = s['duration_sec']
         total_time += d
+        focus += s.get('active_sec', d)
         words += s['words_typed']
         backspaces += s['backspaces']
         keys += s['keys_pressed']
         mouse += s['mouse_distance']
         apps[s['exe']] = apps.get(s['exe'], 0.0) + d
+        if 'category' in s:
+            cats[s['category']] = cats.get(s['category'], 0.0) + d
+        coalesced += s.get('coalesced', 0)
     switches = max(0, len(sessions) - 1)
     wpm = (words / (total_time / 60.0)) if total_time > 0 else 0.0
     return {
         'total_time_sec': total_time,
+        'time_in_focus_sec': focus,
         'typing_words': words,
         'wpm': wpm,
         'backspaces': backspaces,
         'keys_pressed': keys,
         'mouse_distance': mouse,
         'app_switches': switches,
+        'coalesced_switches': coalesced,
         'time_by_app_sec': apps,
+        'time_by_category_sec': cats,
     }
 
 
+def capture(tracker, rules, coalescer=None):
+    # classifier stage: category is fixed at capture time so rollups never re-parse titles
+    sessions = [s.to_dict() for s in tracker.sessions_flush()]
+    for s in sessions:
+        s['category'] = rules.classify(s['exe'], s['title'])
+    return coalescer.feed(sessions) if coalescer is not None else sessions
+
+
 def main():
+    from dotenv import load_dotenv
     load_dotenv()
     parser = argparse.ArgumentParser(description='Performance Meter (Windows)')
     parser.add_argument('--role', required=True, help='Role profile, e.g., coder, engineer, hr')
@@ -55,17 +70,38 @@ def main():
     parser.add_argument('--data-dir', default='data', help='Output directory for JSONL logs')
     parser.add_argument('--flush-sec', type=int, default=60, help='Flush interval seconds')
     parser.add_argument('--gemini-interval-sec', type=int, default=0, help='If >0, send summary to Gemini every N seconds; if 0, only on exit')
+    parser.add_argument('--idle-sec', type=float, default=300, help='No input for this long closes the session and slows polling (0 = off)')
+    parser.add_argument('--coalesce-sec', type=float, default=1.0,
+                        help='Fold sessions shorter than this into their neighbours (0 = keep every session)')
+    parser.add_argument('--bucket-sec', type=int, default=60, help='Activity timeline bucket seconds (0 = off)')
+    parser.add_argument('--collector-url', default=os.getenv('PERFMETER_COLLECTOR_URL', ''), help='Fleet collector base URL; flushed sessions are pushed there')
+    parser.add_argument('--upload-watermark', type=int, default=200, help='Upload once this many sessions are spooled')
+    parser.add_argument('--upload-max-delay-sec', type=float, default=300, help='...or once the oldest spooled batch is this old')
+    parser.add_argument('--team', default=os.getenv('PERFMETER_TEAM', ''), help='Team name reported to the collector')
+    parser.add_argument('--selfmon-sec', type=float, default=30, help='Self-telemetry sample interval seconds (0 = off)')
+    parser.add_argument('--cpu-budget-pct', type=float, default=1.0, help='Agent CPU budget (%% of machine); above it mouse sampling backs off')
+    parser.add_argument('--rss-budget-mb', type=float, default=150, help='Agent RSS budget in MB (alarm only)')
+    parser.add_argument('--mouse-mode', choices=['exact', 'coalesce', 'adaptive'], default='adaptive',
+                        help='Mouse distance sampling: every event, coalesced to --mouse-hz, or coalesced with CPU back-off')
+    parser.add_argument('--mouse-hz', type=float, default=60, help='Mouse sample rate for coalesce/adaptive modes')
     args = parser.parse_args()
+    # heavy or platform-only modules load after argument parsing, so --help and bad flags return immediately
+    import webbrowser
+    import yaml
+    from .gemini_client import GeminiClient
+    from .selfmon import SelfMonitor
+    from .tracker import ActiveAppTracker
+    from .uploader import CollectorClient, SpoolUploader, default_device_id
 
     rules_path = Path(args.rules)
     if not rules_path.exists():
         print(f"[warn] rules file not found at {rules_path}. Proceeding with no exclusions.")
-    rules = load_rules(rules_path)
+    # reloaded when the file changes; no restart needed after editing rules
+    rules = LiveRules(rules_path)
     # brief rules summary
     try:
-        from .rules import Rules  # type: ignore
-        excl = sorted(getattr(rules, 'exclude_apps', []))
-        incl = sorted(getattr(rules, 'include_apps', []))
+        excl = sorted(getattr(rules.rules, 'exclude_apps', []))
+        incl = sorted(getattr(rules.rules, 'include_apps', []))
         if incl:
             print(f"[rules] include_apps={incl}")
         if excl:
@@ -83,11 +119,28 @@ def main():
         print(f"[warn] Role '{args.role}' not found in profiles; continuing without weights.")
     weights = role_cfg.get('metrics_weights', {}) if isinstance(role_cfg, dict) else {}
 
-    tracker = ActiveAppTracker(allow_input_metrics_fn=rules.is_app_metrics_allowed)
+    tracker = ActiveAppTracker(allow_input_metrics_fn=rules.is_app_metrics_allowed,
+                               mouse_mode=args.mouse_mode, mouse_hz=args.mouse_hz, bucket_sec=args.bucket_sec,
+                               idle_sec=args.idle_sec)
     tracker.start()
+    coalescer = Coalescer(args.coalesce_sec) if args.coalesce_sec > 0 else None
 
-    agg = Aggregator(Path(args.data_dir), flush_interval_sec=args.flush_sec)
+    sinks = []
+    uploader = None
+    if args.collector_url:
+        collector = CollectorClient(args.collector_url, default_device_id(), team=args.team, role=args.role,
+                                    token=os.getenv('PERFMETER_COLLECTOR_TOKEN', ''))
+        # flushes are spooled to disk and uploaded in the background, so capture never waits on the network
+        uploader = SpoolUploader(Path(args.data_dir) / 'spool', collector,
+                                 watermark_sessions=args.upload_watermark, max_delay_sec=args.upload_max_delay_sec)
+        uploader.start()
+        sinks.append(uploader.enqueue)
+    agg = Aggregator(Path(args.data_dir), flush_interval_sec=args.flush_sec, sinks=sinks)
     gemini = GeminiClient()
+    selfmon = None
+    if args.selfmon_sec > 0:
+        selfmon = SelfMonitor(Path(args.data_dir), tracker, agg, interval_sec=args.selfmon_sec,
+                              cpu_budget_pct=args.cpu_budget_pct, rss_budget_mb=args.rss_budget_mb)
 
     stop = threading.Event()
     exit_now = threading.Event()
@@ -111,11 +164,15 @@ def main():
     try:
         while not first_interrupt.is_set():
             time.sleep(5)
-            sessions = [s.to_dict() for s in tracker.sessions_flush()]
+            sessions = capture(tracker, rules, coalescer)
             if sessions:
                 agg.add_sessions(sessions)
                 gem_buffer.extend(sessions)
                 all_buffer.extend(sessions)
+            if selfmon is not None:
+                tele = selfmon.maybe_sample()
+                if tele and tele['alarms']:
+                    print(f"[selfmon] {'; '.join(tele['alarms'])} (mouse interval {tele['mouse_interval_ms']} ms)")
             now = time.time()
             if gemini.enabled() and args.gemini_interval_sec > 0 and (now - last_gem) >= args.gemini_interval_sec:
                 # summarize accumulated data since last send
@@ -138,11 +195,15 @@ def main():
         # First interrupt phase: finalize capture, start dashboard, async Gemini, wait for second interrupt to exit
         tracker.stop()
         # one more drain
-        sessions = [s.to_dict() for s in tracker.sessions_flush()]
+        sessions = capture(tracker, rules, coalescer)
+        if coalescer is not None:
+            sessions += coalescer.drain()
         if sessions:
             agg.add_sessions(sessions)
             all_buffer.extend(sessions)
         agg.stop()
+        if uploader is not None:
+            uploader.stop(flush_timeout=5.0)
 
         if all_buffer:
             final_summary = summarize_for_gemini(all_buffer)
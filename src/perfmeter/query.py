@@ -0,0 +1,281 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+from .aggregator import load_titles
+from .logload import loads
+from .rules import default_classifier
+
+# Ad-hoc aggregation over data/metrics-YYYYMMDD.jsonl. Each day file in the range is planned on its own:
+# closed days whose filters and grouping fit the hourly rollup are answered from
+# data/rollups/YYYYMMDD.json (built on first use, rebuilt when the source file changes); anything else
+# (today, title filters, partial hours) is streamed line by line. Sessions count in the local hour/day of
+# start_ts, not of the file they sit in: the aggregator writes a session into the file of the day it is
+# flushed, so one that starts before midnight (or is held back by the coalescer) lands in the next day's file,
+# and the file after the range is read too.
+# Rows carry the category assigned at capture; older rows without one are classified with the default rules.
+
+GROUPS = ('hour', 'day', 'exe', 'category')
+METRICS = ('sessions', 'time_sec', 'active_sec', 'words', 'keys', 'backspaces', 'mouse', 'wpm')
+# summed columns, in rollup row order after (hour_ts, exe, category); hour_ts is the local hour start (epoch)
+SUMS = ('sessions', 'time_sec', 'active_sec', 'words', 'keys', 'backspaces', 'mouse')
+ROLLUP_VERSION = 2
+
+_CLASSIFIER = default_classifier()
+
+
+def session_category(s: Dict[str, Any], exe: str) -> str:
+    return s.get('category') or _CLASSIFIER.classify(exe, str(s.get('title') or ''))
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_time(value: Any, default: float) -> float:
+    # epoch seconds, or YYYY-MM-DD / YYYY-MM-DDTHH[:MM] in local time
+    if value in (None, ''):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    s = str(value).strip()
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M'):
+        try:
+            return time.mktime(time.strptime(s, fmt))
+        except ValueError:
+            continue
+    raise QueryError(f'bad time: {value}')
+
+
+def _as_list(v) -> List[str]:
+    if v is None or v == '':
+        return []
+    if isinstance(v, str):
+        return [x.strip() for x in v.split(',') if x.strip()]
+    return [str(x) for x in v]
+
+
+def normalize(spec: Dict[str, Any]) -> Dict[str, Any]:
+    now = time.time()
+    end = parse_time(spec.get('to'), now)
+    start = parse_time(spec.get('from'), end - 7 * 86400)
+    if end <= start:
+        raise QueryError('empty time range')
+    group_by = _as_list(spec.get('group_by'))
+    bad = [g for g in group_by if g not in GROUPS]
+    if bad:
+        raise QueryError(f'unknown group_by {bad}; use {list(GROUPS)}')
+    metrics = _as_list(spec.get('metrics')) or ['sessions', 'time_sec', 'active_sec']
+    bad = [m for m in metrics if m not in METRICS]
+    if bad:
+        raise QueryError(f'unknown metrics {bad}; use {list(METRICS)}')
+    return {
+        'start': start,
+        'end': end,
+        'group_by': group_by,
+        'metrics': metrics,
+        'exe': {x.lower() for x in _as_list(spec.get('exe'))},
+        'category': set(_as_list(spec.get('category'))),
+        'title_contains': str(spec.get('title_contains') or '').lower(),
+        'min_duration': _number(spec, 'min_duration', float, 0.0),
+        'limit': _number(spec, 'limit', int, 1000),
+    }
+
+
+def _number(spec: Dict[str, Any], key: str, kind, default):
+    value = spec.get(key)
+    if value in (None, ''):
+        return default
+    try:
+        n = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise QueryError(f'bad {key}: {value}')
+    if n != n or n < 0 or (key == 'limit' and n == 0):
+        raise QueryError(f'bad {key}: {value}')
+    return n
+
+
+def _day_files(data_dir: Path, start: float, end: float) -> Iterator[Tuple[str, float, float, Path]]:
+    # local days overlapping [start, end) plus the day after, whose file holds sessions flushed after
+    # midnight: (YYYYMMDD, day_start, day_end, path)
+    t = time.localtime(start)
+    day0 = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1))
+    last = False
+    while not last:
+        last = day0 >= end
+        t = time.localtime(day0 + 86400 + 3600)  # +1h absorbs DST shifts
+        nxt = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1))
+        name = time.strftime('%Y%m%d', time.localtime(day0))
+        yield name, day0, nxt, data_dir / f'metrics-{name}.jsonl'
+        day0 = nxt
+
+
+def iter_sessions(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open('rb') as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except Exception:
+                continue
+
+
+def _session_values(s: Dict[str, Any]) -> Tuple[float, ...]:
+    d = float(s.get('duration_sec', 0.0))
+    return (1, d, float(s.get('active_sec', d)), int(s.get('words_typed', 0)), int(s.get('keys_pressed', 0)),
+            int(s.get('backspaces', 0)), float(s.get('mouse_distance', 0.0)))
+
+
+def _hour_start(ts: float) -> int:
+    t = time.localtime(ts)
+    return int(ts) - t.tm_min * 60 - t.tm_sec
+
+
+def build_rollup(path: Path) -> List[list]:
+    acc: Dict[Tuple[int, str, str], list] = {}
+    for s in iter_sessions(path):
+        ts = float(s.get('start_ts', 0) or 0)
+        exe = str(s.get('exe') or '').lower()
+        key = (_hour_start(ts), exe, session_category(s, exe))
+        row = acc.get(key)
+        if row is None:
+            row = acc[key] = [0] * len(SUMS)
+        for i, v in enumerate(_session_values(s)):
+            row[i] += v
+    return [list(k) + v for k, v in acc.items()]
+
+
+_ROLLUPS: Dict[Path, Tuple[int, float, List[list]]] = {}
+
+
+def load_rollup(data_dir: Path, name: str, path: Path) -> List[list]:
+    # memory -> data/rollups/<day>.json -> rebuild from the day file, each keyed by the source size/mtime
+    st = path.stat()
+    hit = _ROLLUPS.get(path)
+    if hit is not None and hit[0] == st.st_size and hit[1] == st.st_mtime:
+        return hit[2]
+    rows = _read_rollup(data_dir, name, path, st)
+    _ROLLUPS[path] = (st.st_size, st.st_mtime, rows)
+    return rows
+
+
+def _read_rollup(data_dir: Path, name: str, path: Path, st) -> List[list]:
+    rpath = data_dir / 'rollups' / f'{name}.json'
+    try:
+        cached = json.loads(rpath.read_text(encoding='utf-8'))
+        if cached.get('v') == ROLLUP_VERSION and cached.get('size') == st.st_size and cached.get('mtime') == st.st_mtime:
+            return cached['rows']
+    except Exception:
+        pass
+    rows = build_rollup(path)
+    rpath.parent.mkdir(parents=True, exist_ok=True)
+    tmp = rpath.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'v': ROLLUP_VERSION, 'size': st.st_size, 'mtime': st.st_mtime, 'rows': rows}), encoding='utf-8')
+    os.replace(tmp, rpath)
+    return rows
+
+
+def _hour_aligned(ts: float) -> bool:
+    t = time.localtime(ts)
+    return t.tm_min == 0 and t.tm_sec == 0 and ts == int(ts)
+
+
+def run_query(data_dir: Path, spec: Dict[str, Any], use_rollups: bool = True) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    q = normalize(spec)
+    start, end, group_by = q['start'], q['end'], q['group_by']
+    exe_f, cat_f = q['exe'], q['category']
+    today = time.strftime('%Y%m%d')
+    # rollups are hourly and know only exe/category, so other filters force a scan
+    pushdown = use_rollups and not q['title_contains'] and not q['min_duration']
+    edges_ok = _hour_aligned(start) and (_hour_aligned(end) or end >= time.time())
+    acc: Dict[tuple, list] = {}
+    plan = {'rollup_days': 0, 'scanned_days': 0, 'scanned_sessions': 0}
+
+    def add(key, values):
+        row = acc.get(key)
+        if row is None:
+            row = acc[key] = [0] * len(SUMS)
+        for i, v in enumerate(values):
+            row[i] += v
+
+    for name, day0, day1, path in _day_files(data_dir, start, end):
+        if not path.exists():
+            continue
+        # the file also holds sessions from late on the day before, so "whole" reaches back a day (+1h for DST)
+        whole_file = start <= day0 - 90000 and day1 <= end
+        if pushdown and name < today and (whole_file or edges_ok):
+            plan['rollup_days'] += 1
+            for hour_ts, exe, cat, *vals in load_rollup(data_dir, name, path):
+                # with hour-aligned edges every bin lies wholly inside or outside [start, end)
+                if not (start <= hour_ts < end) or (exe_f and exe not in exe_f) or (cat_f and cat not in cat_f):
+                    continue
+                key = []
+                for g in group_by:
+                    if g in ('day', 'hour'):
+                        key.append(time.strftime('%Y-%m-%d' if g == 'day' else '%Y-%m-%dT%H', time.localtime(hour_ts)))
+                    else:
+                        key.append(exe if g == 'exe' else cat)
+                add(tuple(key), vals)
+            continue
+        plan['scanned_days'] += 1
+        title_ids = None
+        if q['title_contains']:
+            # match the day's title dictionary once; interned rows then only need an id lookup
+            title_ids = {i for i, t in load_titles(data_dir, name).items() if q['title_contains'] in t.lower()}
+        for s in iter_sessions(path):
+            ts = float(s.get('start_ts', 0) or 0)
+            if not (start <= ts < end):
+                continue
+            if q['min_duration'] and float(s.get('duration_sec', 0.0)) < q['min_duration']:
+                continue
+            exe = str(s.get('exe') or '').lower()
+            if exe_f and exe not in exe_f:
+                continue
+            if title_ids is not None:
+                if 'title_id' in s:
+                    if s['title_id'] not in title_ids:
+                        continue
+                elif q['title_contains'] not in str(s.get('title') or '').lower():
+                    continue
+            cat = session_category(s, exe) if (cat_f or 'category' in group_by) else ''
+            if cat_f and cat not in cat_f:
+                continue
+            plan['scanned_sessions'] += 1
+            key = []
+            for g in group_by:
+                if g in ('day', 'hour'):
+                    key.append(time.strftime('%Y-%m-%d' if g == 'day' else '%Y-%m-%dT%H', time.localtime(ts)))
+                else:
+                    key.append(exe if g == 'exe' else cat)
+            add(tuple(key), _session_values(s))
+
+    rows = []
+    for key, vals in sorted(acc.items()):
+        row = dict(zip(group_by, key))
+        sums = dict(zip(SUMS, vals))
+        for m in q['metrics']:
+            if m == 'wpm':
+                row[m] = (sums['words'] / (sums['time_sec'] / 60.0)) if sums['time_sec'] > 0 else 0.0
+            else:
+                row[m] = sums[m]
+        rows.append(row)
+    truncated = len(rows) > q['limit']
+    return {
+        'rows': rows[:q['limit']],
+        'truncated': truncated,
+        'from': start,
+        'to': end,
+        'group_by': group_by,
+        'metrics': q['metrics'],
+        'plan': plan,
+        'elapsed_ms': round((time.perf_counter() - t0) * 1000, 2),
+    }
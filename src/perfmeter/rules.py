@@ -1,25 +1,181 @@
+import fnmatch
+import os
+import re
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Pattern sections take one rule per line:
+#   exe:<glob>     title:<glob>     (case-insensitive fnmatch on the whole exe name / window title)
+#   exe~<regex>    title~<regex>    (case-insensitive search)
+# Rules of a section are compiled into at most three regexes per field: plain `*literal*` globs become one
+# literal alternation (searched), other globs one anchored alternation, regexes one search alternation.
+# Decisions are memoized per (exe, title) since the poller asks on every tick.
+# [category <name>] sections (same pattern syntax) classify sessions; first matching category wins, else 'other'.
+CACHE_SIZE = 1024
+RELOAD_CHECK_SEC = 2.0
+
+# used when the rules file defines no categories; each needle matches as a substring of exe or title
+DEFAULT_CATEGORIES: List[Tuple[str, Tuple[str, ...]]] = [
+    ('meeting', ('teams', 'zoom', 'meet', 'webex', 'skype')),
+    ('email', ('outlook', 'thunderbird', 'gmail', 'inbox')),
+    ('chat', ('slack', 'discord', 'whatsapp', 'telegram')),
+    ('code', ('code.exe', 'pycharm', 'idea', 'visual studio', 'devenv', 'vim', 'terminal', 'powershell', 'cmd.exe', '.py', '.js', 'github')),
+    ('docs', ('winword', 'excel', 'powerpnt', 'onenote', 'notion', 'confluence', 'docs.google', '.docx', '.xlsx', '.pdf')),
+    ('browse', ('chrome', 'firefox', 'msedge', 'brave', 'opera')),
+]
+
+
+class Matcher:
+    __slots__ = ('exe', 'title')
+
+    def __init__(self, exe: List[Callable], title: List[Callable]):
+        self.exe = exe
+        self.title = title
+
+    def __bool__(self):
+        return bool(self.exe or self.title)
+
+    def matches(self, exe: str, title: str) -> bool:
+        for rx in self.exe:
+            if rx(exe):
+                return True
+        for rx in self.title:
+            if rx(title):
+                return True
+        return False
+
+
+def _trie_regex(words: List[str]) -> str:
+    # shared prefixes factored out, so the engine walks each candidate position once instead of once per literal
+    root: dict = {}
+    for w in words:
+        node = root
+        for c in w:
+            node = node.setdefault(c, {})
+        node[''] = {}
+
+    def emit(node) -> str:
+        end = '' in node
+        alts = [re.escape(c) + emit(sub) for c, sub in sorted(node.items()) if c]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        if end:
+            return body + '?' if len(alts) == 1 and len(body) == 1 else f'(?:{body})?'
+        return body
+
+    return emit(root)
+
+
+def _compile_field(globs: List[str], regexes: List[str]) -> List[Callable]:
+    literals, anchored, searched = [], [], list(regexes)
+    for g in globs:
+        core = g[1:-1] if len(g) >= 2 and g[0] == '*' and g[-1] == '*' else None
+        if core and not any(c in core for c in '*?['):
+            literals.append(core)
+        else:
+            anchored.append(fnmatch.translate(g))
+    out = []
+    if literals:
+        out.append(re.compile(_trie_regex(literals), re.I).search)
+    if anchored:
+        out.append(re.compile('|'.join(f'(?:{p})' for p in anchored), re.I).match)
+    if searched:
+        out.append(re.compile('|'.join(f'(?:{p})' for p in searched), re.I).search)
+    return out
+
+
+def compile_patterns(lines: List[str], where: str = '') -> Matcher:
+    fields = {'exe': ([], []), 'title': ([], [])}
+    for line in lines:
+        m = re.match(r'(exe|title)\s*([:~])\s*(.+)$', line, re.I)
+        if not m:
+            print(f"[rules] ignored pattern {line!r}{where}")
+            continue
+        name, kind, pat = m.group(1).lower(), m.group(2), m.group(3).strip()
+        if kind == '~':
+            try:
+                re.compile(pat)
+            except re.error as e:
+                print(f"[rules] bad regex {pat!r}{where}: {e}")
+                continue
+            fields[name][1].append(pat)
+        else:
+            fields[name][0].append(pat.lower())
+    return Matcher(_compile_field(*fields['exe']), _compile_field(*fields['title']))
+
+
+class Classifier:
+    # (exe, title) -> category name, memoized per distinct pair
+    def __init__(self, categories: List[Tuple[str, Matcher]]):
+        self.categories = categories
+        self._cache: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+
+    def classify(self, exe: str, title: str) -> str:
+        key = ((exe or '').lower(), title or '')
+        cache = self._cache
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return hit
+        cat = 'other'
+        for name, matcher in self.categories:
+            if matcher.matches(*key):
+                cat = name
+                break
+        cache[key] = cat
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        return cat
+
+
+def default_classifier() -> Classifier:
+    return Classifier([(name, compile_patterns([f'{f}:*{n}*' for n in needles for f in ('exe', 'title')]))
+                       for name, needles in DEFAULT_CATEGORIES])
 
 
 @dataclass
 class Rules:
     exclude_apps: Set[str] = field(default_factory=set)
     include_apps: Set[str] = field(default_factory=set)
+    exclude_patterns: Matcher = field(default_factory=lambda: Matcher([], []))
+    include_patterns: Matcher = field(default_factory=lambda: Matcher([], []))
+    classifier: Classifier = field(default_factory=default_classifier)
+    _cache: 'OrderedDict[Tuple[str, str], bool]' = field(default_factory=OrderedDict, repr=False)
 
-    def is_app_metrics_allowed(self, exe_name: str) -> bool:
-        name = (exe_name or '').lower()
-        if self.include_apps:
-            return name in self.include_apps
+    def _decide(self, name: str, title: str) -> bool:
+        # include rules (if any) gate first; exclude rules then apply to what is left
+        if self.include_apps or self.include_patterns:
+            if name not in self.include_apps and not self.include_patterns.matches(name, title):
+                return False
         if name in self.exclude_apps:
             return False
-        return True
+        return not self.exclude_patterns.matches(name, title)
+
+    def is_app_metrics_allowed(self, exe_name: str, title: str = '') -> bool:
+        name = (exe_name or '').lower()
+        if not (self.exclude_patterns or self.include_patterns):
+            return self._decide(name, title)
+        key = (name, title)
+        cache = self._cache
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return hit
+        allowed = cache[key] = self._decide(name, title)
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        return allowed
 
 
 def load_rules(path: Path) -> Rules:
     exclude: Set[str] = set()
     include: Set[str] = set()
+    patterns = {'exclude': [], 'include': []}
+    categories: Dict[str, List[str]] = {}
     section = None
     if not path.exists():
         return Rules()
@@ -27,14 +183,66 @@ def load_rules(path: Path) -> Rules:
         line = raw.strip()
         if not line or line.startswith('#'):
             continue
-        if line.lower() == '[exclude_apps]':
-            section = 'exclude'
+        low = line.lower()
+        if low in ('[exclude_apps]', '[include_apps]', '[exclude_patterns]', '[include_patterns]'):
+            section = low[1:-1]
             continue
-        if line.lower() == '[include_apps]':
-            section = 'include'
+        if low.startswith('[category ') and low.endswith(']'):
+            section = low[1:-1]
+            categories.setdefault(section.split(None, 1)[1].strip(), [])
             continue
-        if section == 'exclude':
-            exclude.add(line.lower())
-        elif section == 'include':
-            include.add(line.lower())
-    return Rules(exclude_apps=exclude, include_apps=include)
+        if section == 'exclude_apps':
+            exclude.add(low)
+        elif section == 'include_apps':
+            include.add(low)
+        elif section in ('exclude_patterns', 'include_patterns'):
+            patterns[section.split('_')[0]].append(line)
+        elif section and section.startswith('category '):
+            categories[section.split(None, 1)[1].strip()].append(line)
+    classifier = (Classifier([(name, compile_patterns(lines, f' in {path}')) for name, lines in categories.items()])
+                  if categories else default_classifier())
+    return Rules(exclude_apps=exclude, include_apps=include,
+                 exclude_patterns=compile_patterns(patterns['exclude'], f' in {path}'),
+                 include_patterns=compile_patterns(patterns['include'], f' in {path}'),
+                 classifier=classifier)
+
+
+class LiveRules:
+    # Rules that follow the file: mtime is checked at most every RELOAD_CHECK_SEC, and a changed file is
+    # reloaded (and the decision cache dropped) on the next call. A file that fails to load keeps the old rules.
+    def __init__(self, path: Path, check_sec: float = RELOAD_CHECK_SEC):
+        self.path = path
+        self.check_sec = check_sec
+        self._mtime = self._stat()
+        self.rules = load_rules(path)
+        self._next_check = time.monotonic() + check_sec
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def maybe_reload(self) -> bool:
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_sec
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return False
+        try:
+            self.rules = load_rules(self.path)
+        except Exception as e:
+            print(f"[rules] reload failed: {e}")
+            return False
+        self._mtime = mtime
+        print(f"[rules] reloaded {self.path}")
+        return True
+
+    def is_app_metrics_allowed(self, exe_name: str, title: str = '') -> bool:
+        self.maybe_reload()
+        return self.rules.is_app_metrics_allowed(exe_name, title)
+
+    def classify(self, exe_name: str, title: str) -> str:
+        return self.rules.classifier.classify(exe_name, title)
@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import psutil
+
+
+class LatencyWindow:
+    # count/total/max since the last snapshot; cheap enough for per-event hook callbacks
+    __slots__ = ('n', 'total', 'max')
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, sec: float):
+        self.n += 1
+        self.total += sec
+        if sec > self.max:
+            self.max = sec
+
+    def snapshot(self) -> Dict[str, Any]:
+        n, total, mx = self.n, self.total, self.max
+        self.n, self.total, self.max = 0, 0.0, 0.0
+        return {'n': n, 'avg_ms': round(total / n * 1000, 3) if n else 0.0, 'max_ms': round(mx * 1000, 3)}
+
+
+class SelfMonitor:
+    # Samples the agent's own footprint and writes one compact line per interval to
+    # agent-telemetry-YYYYMMDD.jsonl. In adaptive mouse mode over-budget CPU backs off mouse
+    # sampling; it is relaxed towards the base rate once CPU falls below half the budget.
+    MOUSE_BACKOFF_MAX_SEC = 0.1
+
+    def __init__(self, out_dir: Path, tracker, aggregator, interval_sec: float = 30.0,
+                 cpu_budget_pct: float = 1.0, rss_budget_mb: float = 150.0):
+        self.out_dir = out_dir
+        self.tracker = tracker
+        self.aggregator = aggregator
+        self.interval_sec = interval_sec
+        self.cpu_budget_pct = cpu_budget_pct
+        self.rss_budget_mb = rss_budget_mb
+        self._proc = psutil.Process(os.getpid())
+        self._ncpu = psutil.cpu_count() or 1
+        self._proc.cpu_percent(None)  # prime; the next call reports usage since now
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def maybe_sample(self) -> Optional[Dict[str, Any]]:
+        if time.monotonic() - self._last < self.interval_sec:
+            return None
+        return self.sample()
+
+    def sample(self) -> Dict[str, Any]:
+        with self._lock:
+            self._last = time.monotonic()
+            # share of the whole machine, which is what the budget is about
+            cpu = self._proc.cpu_percent(None) / self._ncpu
+            rss_mb = self._proc.memory_info().rss / (1024 * 1024)
+            rec = {
+                'ts': round(time.time(), 3),
+                'cpu_pct': round(cpu, 3),
+                'rss_mb': round(rss_mb, 1),
+                'threads': self._proc.num_threads(),
+                'hooks': {k: w.snapshot() for k, w in self.tracker.hook_latency.items()},
+                'poll_drift': self.tracker.poll_drift.snapshot(),
+                'queue': self.aggregator.queue_depth(),
+                'mouse_interval_ms': round(self.tracker.mouse_min_interval * 1000, 1),
+                'alarms': [],
+            }
+            self._apply_budgets(rec, cpu, rss_mb)
+            self._write(rec)
+            return rec
+
+    def _apply_budgets(self, rec: Dict[str, Any], cpu: float, rss_mb: float):
+        cur = self.tracker.mouse_min_interval
+        base = self.tracker.mouse_base_interval
+        adaptive = self.tracker.mouse_mode == 'adaptive'
+        new = cur
+        if self.cpu_budget_pct > 0 and cpu > self.cpu_budget_pct:
+            rec['alarms'].append(f'cpu {cpu:.2f}% > {self.cpu_budget_pct}%')
+            if adaptive:
+                new = min(self.MOUSE_BACKOFF_MAX_SEC, max(cur * 2, 1 / 30))
+        elif adaptive and cur > base and cpu < self.cpu_budget_pct / 2:
+            new = max(base, cur / 2)
+        if new != cur:
+            self.tracker.mouse_min_interval = new
+            rec['mouse_interval_ms'] = round(new * 1000, 1)
+        if self.rss_budget_mb > 0 and rss_mb > self.rss_budget_mb:
+            rec['alarms'].append(f'rss {rss_mb:.0f}MB > {self.rss_budget_mb:.0f}MB')
+
+    def _write(self, rec: Dict[str, Any]):
+        fpath = self.out_dir / f"agent-telemetry-{time.strftime('%Y%m%d')}.jsonl"
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        with fpath.open('a', encoding='utf-8') as f:
+            f.write(json.dumps(rec, separators=(',', ':')) + '\n')
@@ -1,6 +1,7 @@
 import threading
 import time
 import math
+from array import array
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
 
@@ -9,6 +10,40 @@ import win32gui  # type: ignore
 import win32process  # type: ignore
 from pynput import keyboard, mouse
 
+from .selfmon import LatencyWindow
+
+POLL_SEC = 0.5
+IDLE_POLL_SEC = 5.0
+# a wall-clock gap this much longer than the poll interval means the machine was suspended
+SUSPEND_GAP_SEC = 30.0
+# Mouse modes: exact = distance per OS event; coalesce = at most mouse_hz samples/s, straight-line
+# distance between samples plus a flush at every poll/session boundary; adaptive = coalesce, and
+# SelfMonitor may lower the rate further when the agent is over its CPU budget.
+# Coalesced distance sums chords, so it never exceeds the path; the shortfall per sample is at most
+# 1 - cos(theta/2) of that stretch, theta being the heading change within one sample interval.
+MOUSE_MODES = ('exact', 'coalesce', 'adaptive')
+
+
+try:
+    import ctypes
+
+    class _LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+
+    _user32 = ctypes.windll.user32  # type: ignore[attr-defined]
+    _kernel32 = ctypes.windll.kernel32  # type: ignore[attr-defined]
+
+    def os_idle_seconds() -> Optional[float]:
+        # system-wide time since last input (GetLastInputInfo); tick counts wrap every 49.7 days
+        info = _LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if not _user32.GetLastInputInfo(ctypes.byref(info)):
+            return None
+        return ((_kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
+except Exception:
+    def os_idle_seconds() -> Optional[float]:
+        return None
+
 
 @dataclass
 class InputStats:
@@ -18,6 +53,51 @@ class InputStats:
     mouse_distance: float = 0.0  # pixels
 
 
+class ActivityBuckets:
+    # Fixed-interval input counters aligned to wall-clock multiples of `sec`; a bucket with no key or
+    # mouse input is idle. Stored as flat arrays, one slot per interval the session touches.
+    __slots__ = ('sec', 'origin', 'keys', 'words', 'backspaces', 'mouse')
+
+    def __init__(self, start_ts: float, sec: int = 60):
+        self.sec = sec
+        self.origin = start_ts - start_ts % sec
+        self.keys = array('I')
+        self.words = array('I')
+        self.backspaces = array('I')
+        self.mouse = array('f')
+
+    def slot(self, ts: float) -> int:
+        i = max(0, int((ts - self.origin) // self.sec))
+        grow = i + 1 - len(self.keys)
+        if grow > 0:
+            zeros = [0] * grow
+            self.keys.extend(zeros)
+            self.words.extend(zeros)
+            self.backspaces.extend(zeros)
+            self.mouse.extend(zeros)
+        return i
+
+    def active_sec(self, start_ts: float, end_ts: float) -> float:
+        # session time that falls into non-idle buckets
+        total = 0.0
+        for i in range(len(self.keys)):
+            if self.keys[i] or self.mouse[i]:
+                b0 = self.origin + i * self.sec
+                total += max(0.0, min(end_ts, b0 + self.sec) - max(start_ts, b0))
+        return total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            't0': self.origin,
+            'sec': self.sec,
+            'keys': self.keys.tolist(),
+            'words': self.words.tolist(),
+            'backspaces': self.backspaces.tolist(),
+            'mouse': [round(v, 1) for v in self.mouse],
+            'idle': [0 if (k or m) else 1 for k, m in zip(self.keys, self.mouse)],
+        }
+
+
 @dataclass
 class AppSession:
     exe: str
@@ -25,31 +105,60 @@ class AppSession:
     start_ts: float
     last_ts: float
     input: InputStats = field(default_factory=InputStats)
+    # None for apps whose input metrics are paused by rules; their whole duration counts as focus
+    activity: Optional[ActivityBuckets] = None
+    end_reason: str = ''  # switch | idle | suspend | stop
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
+        duration = max(0.0, self.last_ts - self.start_ts)
+        out = {
             'exe': self.exe,
             'title': self.title,
             'start_ts': self.start_ts,
             'end_ts': self.last_ts,
-            'duration_sec': max(0.0, self.last_ts - self.start_ts),
+            'duration_sec': duration,
+            'active_sec': duration,
             'words_typed': self.input.words_typed,
             'backspaces': self.input.backspaces,
             'keys_pressed': self.input.keys_pressed,
             'mouse_distance': self.input.mouse_distance,
+            'end_reason': self.end_reason,
         }
+        if self.activity is not None:
+            self.activity.slot(self.last_ts)
+            out['active_sec'] = min(duration, self.activity.active_sec(self.start_ts, self.last_ts))
+            out['activity'] = self.activity.to_dict()
+        return out
 
 
 class ActiveAppTracker:
-    def __init__(self, allow_input_metrics_fn):
+    def __init__(self, allow_input_metrics_fn, mouse_mode: str = 'adaptive', mouse_hz: float = 60.0,
+                 bucket_sec: int = 60, idle_sec: float = 300.0):
         self._lock = threading.RLock()
         self._current: Optional[AppSession] = None
         self._allow_input_metrics_fn = allow_input_metrics_fn
         self._sessions = []
         self._stop = threading.Event()
+        # idle: no input for idle_sec closes the session at the last input and slows polling;
+        # the first input afterwards reopens the session itself (so it is counted) and wakes the poller
+        self.idle_sec = idle_sec
+        self.idle = False
+        self._wake = threading.Event()
+        self._last_input = time.perf_counter()
         # keyboard/mouse
         self._km_enabled = True
+        self.bucket_sec = bucket_sec
         self._last_mouse_pos = None
+        # self-telemetry: callback cost, poll lateness, and the mouse back-off set by SelfMonitor
+        self.hook_latency = {'key': LatencyWindow(), 'mouse': LatencyWindow()}
+        self.poll_drift = LatencyWindow()
+        if mouse_mode not in MOUSE_MODES:
+            raise ValueError(f'mouse_mode must be one of {MOUSE_MODES}')
+        self.mouse_mode = mouse_mode
+        self.mouse_base_interval = 0.0 if mouse_mode == 'exact' or mouse_hz <= 0 else 1.0 / mouse_hz
+        self.mouse_min_interval = self.mouse_base_interval
+        self._last_mouse_sample = 0.0
+        self._mouse_raw = None  # latest OS position, written without the lock
         self._kb_listener = keyboard.Listener(on_press=self._on_key_press)
         self._ms_listener = mouse.Listener(on_move=self._on_mouse_move)
 
@@ -60,13 +169,23 @@ class ActiveAppTracker:
 
     def stop(self):
         self._stop.set()
+        self._wake.set()
         self._kb_listener.stop()
         self._ms_listener.stop()
         with self._lock:
-            if self._current:
-                self._current.last_ts = time.time()
-                self._sessions.append(self._current)
-                self._current = None
+            self._close_current_locked(time.time(), 'stop')
+
+    def _close_current_locked(self, end_ts: float, reason: str):
+        self._flush_mouse_locked()
+        if self._current:
+            self._current.last_ts = max(self._current.start_ts, end_ts)
+            self._current.end_reason = reason
+            self._sessions.append(self._current)
+            self._current = None
+
+    def idle_seconds(self) -> float:
+        sec = os_idle_seconds()
+        return sec if sec is not None else time.perf_counter() - self._last_input
 
     def sessions_flush(self):
         with self._lock:
@@ -87,46 +206,115 @@ class ActiveAppTracker:
     def _rotate_session_if_needed(self, exe: str, title: str):
         now = time.time()
         with self._lock:
+            # pending coalesced movement belongs to the session that is about to end
+            self._flush_mouse_locked()
             if self._current and (self._current.exe != exe or self._current.title != title):
-                self._current.last_ts = now
-                self._sessions.append(self._current)
-                self._current = None
+                self._close_current_locked(now, 'switch')
+            self._km_enabled = self._allow_input_metrics_fn(exe, title)
             if not self._current:
-                self._current = AppSession(exe=exe, title=title, start_ts=now, last_ts=now)
+                activity = ActivityBuckets(now, self.bucket_sec) if self._km_enabled and self.bucket_sec > 0 else None
+                self._current = AppSession(exe=exe, title=title, start_ts=now, last_ts=now, activity=activity)
             else:
                 self._current.last_ts = now
-            self._km_enabled = self._allow_input_metrics_fn(exe)
 
     def _poll_foreground(self):
+        prev = None
+        prev_wall = time.time()
+        interval = POLL_SEC
         while not self._stop.is_set():
+            start = time.monotonic()
+            wall = time.time()
+            if prev is not None and not self._wake.is_set():
+                # how much later than the interval this iteration started (work time + scheduler delay)
+                self.poll_drift.add(max(0.0, start - prev - interval))
+            prev = start
+            self._wake.clear()
+            if wall - prev_wall > interval + SUSPEND_GAP_SEC:
+                # suspended (or frozen): the session ends at the last poll before the gap
+                with self._lock:
+                    self._close_current_locked(prev_wall, 'suspend')
+            prev_wall = wall
+            idle = self.idle_seconds() if self.idle_sec > 0 else 0.0
+            if idle >= self.idle_sec > 0:
+                if not self.idle:
+                    self.idle = True
+                    with self._lock:
+                        self._close_current_locked(wall - idle, 'idle')
+                interval = IDLE_POLL_SEC
+            else:
+                self.idle = False
+                exe, title = self._get_foreground_exe_and_title()
+                self._rotate_session_if_needed(exe, title)
+                interval = POLL_SEC
+            self._wake.wait(interval)
+
+    def _resume_on_input(self):
+        # no open session (idle, suspend, or before the first poll): open it for the foreground window now,
+        # so the input that woke the tracker is counted instead of dropped
+        if self._current is None and not self._stop.is_set():
+            self.idle = False
             exe, title = self._get_foreground_exe_and_title()
             self._rotate_session_if_needed(exe, title)
-            time.sleep(0.5)
 
     def _on_key_press(self, key):
+        t0 = self._last_input = time.perf_counter()
+        if self.idle:
+            self._wake.set()
+        self._resume_on_input()
         with self._lock:
             if not self._current:
                 return
-            self._current.last_ts = time.time()
+            now = self._current.last_ts = time.time()
             if self._km_enabled:
                 self._current.input.keys_pressed += 1
+                act = self._current.activity
+                i = act.slot(now) if act is not None else -1
+                if i >= 0:
+                    act.keys[i] += 1
                 try:
                     if key == keyboard.Key.backspace:
                         self._current.input.backspaces += 1
+                        if i >= 0:
+                            act.backspaces[i] += 1
                     elif key in (keyboard.Key.space, keyboard.Key.enter, keyboard.Key.tab):
                         self._current.input.words_typed += 1
+                        if i >= 0:
+                            act.words[i] += 1
                 except Exception:
                     pass
+            self.hook_latency['key'].add(time.perf_counter() - t0)
 
     def _on_mouse_move(self, x, y):
+        t0 = self._last_input = time.perf_counter()
+        if self.idle:
+            self._wake.set()
+        # before recording (x, y): opening the session flushes the raw position, which would swallow this move
+        self._resume_on_input()
+        self._mouse_raw = (x, y)
+        if t0 - self._last_mouse_sample < self.mouse_min_interval:
+            # coalesced: the next sample (or flush) measures from the last sampled point
+            return
+        self._last_mouse_sample = t0
         with self._lock:
-            if not self._current:
-                self._last_mouse_pos = (x, y)
-                return
-            self._current.last_ts = time.time()
-            if self._km_enabled:
-                if self._last_mouse_pos is not None:
-                    lx, ly = self._last_mouse_pos
-                    dist = math.hypot(x - lx, y - ly)
-                    self._current.input.mouse_distance += dist
-                self._last_mouse_pos = (x, y)
+            self._mouse_sample_locked(x, y)
+        self.hook_latency['mouse'].add(time.perf_counter() - t0)
+
+    def _mouse_sample_locked(self, x, y):
+        if not self._current:
+            self._last_mouse_pos = (x, y)
+            return
+        now = self._current.last_ts = time.time()
+        if self._km_enabled:
+            if self._last_mouse_pos is not None:
+                lx, ly = self._last_mouse_pos
+                dist = math.hypot(x - lx, y - ly)
+                self._current.input.mouse_distance += dist
+                act = self._current.activity
+                if act is not None and dist:
+                    act.mouse[act.slot(now)] += dist
+            self._last_mouse_pos = (x, y)
+
+    def _flush_mouse_locked(self):
+        raw = self._mouse_raw
+        if raw is not None and raw != self._last_mouse_pos and self.mouse_min_interval:
+            self._mouse_sample_locked(*raw)
@@ -0,0 +1,255 @@
+import gzip
+import json
+import os
+import random
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+def default_device_id() -> str:
+    return os.getenv('PERFMETER_DEVICE') or socket.gethostname()
+
+
+def utc_offset() -> int:
+    # seconds east of UTC right now; sent with each batch so the collector buckets sessions by the device's local day
+    return time.localtime().tm_gmtoff
+
+
+class CollectorClient:
+    # Pushes flushed session batches to the fleet collector's POST /ingest (gzip JSON).
+    def __init__(self, url: str, device: str, team: str = '', role: str = '', token: str = '', timeout: float = 10):
+        base = url.rstrip('/')
+        self.url = base if base.endswith('/ingest') else base + '/ingest'
+        self.device = device
+        self.team = team
+        self.role = role
+        self.token = token
+        self.timeout = timeout
+        self._seq = 0
+        import requests  # only agents with --collector-url pay for it
+        self._session = requests.Session()
+
+    def next_seq(self) -> int:
+        # millisecond clock keeps seq increasing across agent restarts
+        self._seq = max(self._seq + 1, int(time.time() * 1000))
+        return self._seq
+
+    def send(self, gz_body: bytes, content_type: str = 'application/json') -> Dict[str, Any]:
+        headers = {'Content-Type': content_type, 'Content-Encoding': 'gzip'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        r = self._session.post(self.url, data=gz_body, headers=headers, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def post(self, batches: List[Dict[str, Any]]) -> Dict[str, Any]:
+        body = {'device': self.device, 'team': self.team, 'role': self.role, 'batches': batches}
+        return self.send(gzip.compress(json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6))
+
+    def push(self, sessions: List[Dict[str, Any]]):
+        if sessions:
+            self.post([{'seq': self.next_seq(), 'utc_offset': utc_offset(), 'sessions': sessions}])
+
+
+class SpoolUploader:
+    # Offline-safe upload stage behind Aggregator flushes. Each flushed batch becomes one gzip member
+    # holding a single {"seq", "sessions"} JSON line in spool/<seq>.ndjson.gz; nothing stays in memory.
+    # A background thread sends spooled batches oldest-first once the watermark is reached, as one
+    # multi-batch NDJSON request recompressed as a single gzip stream (about half the bytes of the
+    # per-batch members). Files at or below the collector's acked seq are deleted; failures back off
+    # exponentially (with jitter).
+    STATE = 'state.json'
+
+    def __init__(self, spool_dir: Path, client: CollectorClient, watermark_sessions: int = 200,
+                 max_delay_sec: float = 300, max_request_bytes: int = 512 * 1024, max_spool_mb: float = 200,
+                 backoff_base_sec: float = 2, backoff_max_sec: float = 600):
+        self.dir = spool_dir
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.client = client
+        self.watermark_sessions = watermark_sessions
+        self.max_delay_sec = max_delay_sec
+        self.max_request_bytes = max_request_bytes
+        self.max_spool_bytes = int(max_spool_mb * 1024 * 1024)
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.failures = 0
+        self.stats = {'requests': 0, 'batches': 0, 'sessions': 0, 'bytes': 0, 'errors': 0, 'dropped': 0, 'quarantined': 0}
+        state = self._load_state()
+        # the clock floor keeps seq increasing even if the spool directory was wiped
+        self._next_seq = max(int(state.get('next_seq', 0)), int(time.time() * 1000))
+        self.acked = int(state.get('acked', 0))
+        self._pending_sessions = sum(self._count(p) for p in self._files())
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            return json.loads((self.dir / self.STATE).read_text(encoding='utf-8'))
+        except Exception:
+            return {}
+
+    def _save_state(self):
+        tmp = self.dir / (self.STATE + '.tmp')
+        tmp.write_text(json.dumps({'next_seq': self._next_seq, 'acked': self.acked}), encoding='utf-8')
+        os.replace(tmp, self.dir / self.STATE)
+
+    def _files(self) -> List[Path]:
+        return sorted(self.dir.glob('*.ndjson.gz'))
+
+    @staticmethod
+    def _count(path: Path) -> int:
+        # session count is encoded in the file name: <seq>-<n>.ndjson.gz
+        try:
+            return int(path.name.split('.')[0].split('-')[1])
+        except (IndexError, ValueError):
+            return 0
+
+    def enqueue(self, sessions: List[Dict[str, Any]]):
+        # Aggregator sink: a small local write, never a network call
+        if not sessions:
+            return
+        with self._lock:
+            self._next_seq += 1
+            seq = self._next_seq
+            self._save_state()
+        line = json.dumps({'seq': seq, 'utc_offset': utc_offset(), 'sessions': sessions}, ensure_ascii=False, separators=(',', ':')) + '\n'
+        path = self.dir / f'{seq:020d}-{len(sessions)}.ndjson.gz'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(gzip.compress(line.encode('utf-8'), 9))
+        os.replace(tmp, path)
+        with self._lock:
+            self._pending_sessions += len(sessions)
+        self._enforce_cap()
+        self._wake.set()
+
+    def _enforce_cap(self):
+        files = self._files()
+        total = sum(p.stat().st_size for p in files)
+        while files and total > self.max_spool_bytes:
+            # bounded disk: oldest batches go first
+            p = files.pop(0)
+            total -= p.stat().st_size
+            with self._lock:
+                self._pending_sessions -= self._count(p)
+                self.stats['dropped'] += self._count(p)
+            p.unlink(missing_ok=True)
+
+    def due(self) -> bool:
+        files = self._files()
+        if not files:
+            return False
+        if self._pending_sessions >= self.watermark_sessions:
+            return True
+        return time.time() - files[0].stat().st_mtime >= self.max_delay_sec
+
+    def upload_once(self) -> int:
+        # sends one multi-batch request; returns batches acknowledged (raises on failure)
+        files = self._files()
+        if not files:
+            return 0
+        header = json.dumps({'device': self.client.device, 'team': self.client.team, 'role': self.client.role}) + '\n'
+        parts = [header.encode('utf-8')]
+        size = 0
+        picked = []
+        for p in files:
+            try:
+                data = p.read_bytes()
+                line = gzip.decompress(data)
+                json.loads(line)
+            except (OSError, EOFError, ValueError) as e:
+                # a torn or corrupt file would fail every request it is in: set it aside, send the rest
+                self._quarantine(p, e)
+                continue
+            if picked and size + len(data) > self.max_request_bytes:
+                break
+            parts.append(line)
+            picked.append(p)
+            size += len(data)
+        if not picked:
+            return 0
+        body = gzip.compress(b''.join(parts), 6)
+        acked = int(self.client.send(body, 'application/x-ndjson').get('acked', 0))
+        done = 0
+        for p in picked:
+            if int(p.name.split('-')[0]) <= acked:
+                n = self._count(p)
+                p.unlink(missing_ok=True)
+                with self._lock:
+                    self._pending_sessions -= n
+                    self.stats['sessions'] += n
+                done += 1
+        with self._lock:
+            self.acked = max(self.acked, acked)
+            self._save_state()
+            self.stats['requests'] += 1
+            self.stats['batches'] += done
+            self.stats['bytes'] += len(body)
+        if not done:
+            # a 2xx that acknowledges none of the batches (reset cursor, a proxy answering {}): back off, do not spin
+            raise RuntimeError(f'collector acked seq {acked}, below every batch sent')
+        return done
+
+    def _quarantine(self, path: Path, err: Exception):
+        qdir = self.dir / 'quarantine'
+        qdir.mkdir(exist_ok=True)
+        n = self._count(path)
+        try:
+            os.replace(path, qdir / path.name)
+        except OSError:
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._pending_sessions -= n
+            self.stats['quarantined'] += n
+        print(f"[upload] unreadable spool file {path.name} moved to quarantine/: {err}")
+
+    def backoff_sec(self) -> float:
+        if not self.failures:
+            return 0.0
+        delay = min(self.backoff_max_sec, self.backoff_base_sec * (2 ** (self.failures - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.failures:
+                if self._stop.wait(self.backoff_sec()):
+                    break
+            elif not self.due():
+                self._wake.wait(min(30.0, self.max_delay_sec))
+                self._wake.clear()
+                continue
+            self.drain()
+
+    def drain(self, deadline: Optional[float] = None) -> bool:
+        # uploads until the spool is empty; stops at the first failure (backoff) or deadline
+        while self._files() and not (deadline and time.monotonic() > deadline):
+            try:
+                self.upload_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                with self._lock:
+                    self.stats['errors'] += 1
+                if self.failures in (1, 5) or self.failures % 20 == 0:
+                    print(f"[upload] {e}; retrying in ~{self.backoff_sec():.0f}s ({len(self._files())} batches spooled)")
+                return False
+        if not self._files():
+            self.failures = 0
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, flush_timeout: float = 5.0):
+        # one bounded attempt to push what is left; anything unsent stays spooled for next run
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        if flush_timeout > 0:
+            self.drain(deadline=time.monotonic() + flush_timeout)